@@ -0,0 +1,51 @@
+"""
+Benchmark: full pipeline vs entities-only mode for enhanced extraction
+
+Usage:
+    python benchmarks/bench_entities_only.py --docs 500 --model en_core_web_sm
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from enhanced_entity_extractor_CustomEntity import PipelineRegistry
+
+SAMPLE_TEXT = (
+    "Apple announced the new iPhone 15 Pro at their September event in Cupertino. "
+    "Microsoft unveiled the Xbox Series X and Windows 11 ahead of CES 2024 in Las Vegas, "
+    "while the Super Bowl and the Grammy Awards drew record audiences."
+)
+
+def time_pipeline(nlp, texts, batch_size):
+    """Return documents per second for one pass over the texts"""
+    start = time.perf_counter()
+    for _ in nlp.pipe(texts, batch_size=batch_size):
+        pass
+    return len(texts) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default="en_core_web_sm")
+    parser.add_argument("--docs", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+    
+    texts = [SAMPLE_TEXT] * args.docs
+    registry = PipelineRegistry()
+    
+    results = {}
+    for entities_only in (False, True):
+        nlp = registry.get(args.model, entities_only=entities_only)
+        nlp(SAMPLE_TEXT)  # warm up
+        mode = "entities-only" if entities_only else "full pipeline"
+        results[mode] = time_pipeline(nlp, texts, args.batch_size)
+        print(f"{mode:>14}: {results[mode]:8.1f} docs/sec  components={nlp.pipe_names}")
+    
+    speedup = results["entities-only"] / results["full pipeline"]
+    print(f"Speedup: {speedup:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark: NAICSPSCTrainer training time from 1 to N CPU workers
+
+Usage:
+    python benchmarks/bench_parallel_training.py --workers 1 2 4 --scale 5 --iterations 10
+
+--scale repeats the generated training data to simulate larger code tables.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from naics_psc_trainer import NAICSPSCTrainer
+
+def time_training(training_data, workers, iterations, sync_every):
+    """Train a fresh model and return the wall-clock seconds"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        trainer = NAICSPSCTrainer()
+        start = time.perf_counter()
+        if workers == 1:
+            trainer.train_model(list(training_data), iterations)
+        else:
+            trainer.train_model_parallel(training_data, iterations, n_workers=workers,
+                                         sync_every=sync_every)
+        return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel NAICS/PSC training")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, os.cpu_count() or 1}))
+    parser.add_argument("--scale", type=int, default=1, help="repeat the training data N times")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--sync-every", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        training_data = NAICSPSCTrainer().generate_training_data() * args.scale
+    print(f"{len(training_data)} examples, {args.iterations} iterations")
+
+    results = []
+    baseline = None
+    for workers in args.workers:
+        random.seed(args.seed)
+        seconds = time_training(training_data, workers, args.iterations, args.sync_every)
+        baseline = baseline or seconds
+        results.append({"workers": workers, "seconds": seconds, "speedup": baseline / seconds})
+        print(f"  {workers:>3} workers: {seconds:7.2f}s  speedup {baseline / seconds:.2f}x")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"examples": len(training_data), "iterations": args.iterations,
+                       "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
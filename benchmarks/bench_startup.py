@@ -0,0 +1,107 @@
+"""
+Benchmark: time from process start to the first recognized document, for
+ - cold:  NAICSPSCTrainer() + load_model_with_metadata() + code tables (the old path)
+ - fast:  NAICSPSCTrainer.from_saved() with lazy metadata and --exclude
+ - warm:  a job sent to an already running WarmWorkerPool
+
+Usage:
+    python benchmarks/bench_startup.py --model ./naics_psc_model --repeats 5
+
+Without --model, an untrained model with the default code tables is saved to a
+temporary directory (weights don't affect loading time).
+"""
+import argparse
+import contextlib
+import io
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from harness import environment_info, percentile
+from naics_psc_trainer import NAICSPSCTrainer, WarmWorkerPool
+
+TEXT = "The RFP specifies NAICS 541511 and PSC D307 for the cyber security work."
+
+COLD = """
+import contextlib, io, sys
+from naics_psc_trainer import NAICSPSCTrainer
+with contextlib.redirect_stdout(io.StringIO()):
+    trainer = NAICSPSCTrainer()
+    trainer.load_model_with_metadata(sys.argv[1])
+    trainer.naics_db
+trainer.nlp(sys.argv[2])
+"""
+
+FAST = """
+import sys
+from naics_psc_trainer import NAICSPSCTrainer
+trainer = NAICSPSCTrainer.from_saved(sys.argv[1], exclude=sys.argv[3:])
+trainer.nlp(sys.argv[2])
+"""
+
+def save_sample_model(path):
+    with contextlib.redirect_stdout(io.StringIO()):
+        trainer = NAICSPSCTrainer()
+        trainer.create_naics_psc_database()
+        trainer.add_code_recognizer()
+        trainer.nlp.initialize()
+        trainer.save_model_with_metadata(path)
+
+def time_process(script, model, exclude):
+    """Wall-clock seconds for a fresh interpreter to run script"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", script, str(model), TEXT, *exclude],
+                   cwd=REPO_ROOT, check=True, capture_output=True)
+    return time.perf_counter() - start
+
+def summarize(seconds):
+    return {"runs": len(seconds), "p50_ms": percentile(seconds, 50) * 1000,
+            "max_ms": max(seconds) * 1000}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold vs warm model startup")
+    parser.add_argument("--model", help="saved NAICS/PSC model directory")
+    parser.add_argument("--exclude", nargs="*", default=[],
+                        help="components to skip in the fast path")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--processes", type=int, default=2, help="warm pool size")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model = args.model
+        if model is None:
+            model = Path(tmp) / "naics_psc_model"
+            save_sample_model(model)
+
+        results = {"environment": environment_info(), "model": str(args.model or "sample")}
+        results["cold"] = summarize([time_process(COLD, model, []) for _ in range(args.repeats)])
+        results["fast"] = summarize([time_process(FAST, model, args.exclude)
+                                     for _ in range(args.repeats)])
+
+        start = time.perf_counter()
+        with WarmWorkerPool(model, processes=args.processes, exclude=args.exclude) as pool:
+            pool_startup = time.perf_counter() - start
+            job_seconds = []
+            for _ in range(args.repeats):
+                job_start = time.perf_counter()
+                pool.recognize([TEXT])
+                job_seconds.append(time.perf_counter() - job_start)
+        results["warm"] = {**summarize(job_seconds), "pool_startup_ms": pool_startup * 1000}
+
+    for name in ("cold", "fast", "warm"):
+        print(f"  {name:>4}: p50 {results[name]['p50_ms']:9.1f} ms   max {results[name]['max_ms']:9.1f} ms")
+    print(f"  warm pool startup (once): {results['warm']['pool_startup_ms']:.1f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Synthetic corpora for benchmarking
+
+Three shapes of text, all reproducible from a seed:
+    short   - one-sentence news snippets
+    long    - multi-paragraph news articles
+    rfp     - code-heavy contracting text full of NAICS/PSC codes
+"""
+import random
+
+PEOPLE = ["Tim Cook", "Satya Nadella", "Lisa Su", "Jensen Huang", "Mary Barra", "Andy Jassy"]
+COMPANIES = ["Apple", "Microsoft", "Google", "Tesla", "Sony", "Samsung", "Boeing", "Intel"]
+PLACES = ["Cupertino", "Las Vegas", "Paris", "Seattle", "Austin", "Tokyo", "Berlin"]
+PRODUCTS = ["iPhone 15", "Xbox Series X", "Windows 11", "PlayStation 5", "Galaxy S24", "Model S"]
+EVENTS = ["CES 2024", "the Super Bowl", "the Grammy Awards", "WWDC", "the World Cup"]
+NAICS_CODES = ["541511", "541512", "541513", "518210", "334111", "541330", "722511", "336411"]
+PSC_CODES = ["7030", "7035", "D302", "D307", "R425", "R408", "C211", "W152"]
+
+SENTENCE_TEMPLATES = [
+    "{company} announced the {product} at {event} in {place}.",
+    "{person} said {company} will ship the {product} next year.",
+    "Fans in {place} lined up for {event} on Saturday.",
+    "{company} shares rose after {person} previewed the {product}.",
+    "Analysts expect {event} to boost sales of the {product} in {place}.",
+]
+
+RFP_TEMPLATES = [
+    "This solicitation is set aside for small businesses under NAICS {naics}.",
+    "Offerors must demonstrate experience with PSC {psc} requirements.",
+    "The contract combines NAICS {naics} services with PSC {psc} deliverables.",
+    "Section L.3.{n}: Vendors classified under {naics} shall submit past performance.",
+    "CLIN 00{n}: Product Service Code {psc}, firm fixed price, base year plus options.",
+]
+
+def _fill(template, rng):
+    return template.format(
+        person=rng.choice(PEOPLE), company=rng.choice(COMPANIES), place=rng.choice(PLACES),
+        product=rng.choice(PRODUCTS), event=rng.choice(EVENTS),
+        naics=rng.choice(NAICS_CODES), psc=rng.choice(PSC_CODES), n=rng.randint(1, 9),
+    )
+
+def short_sentences(count, seed=0):
+    """One news sentence per document"""
+    rng = random.Random(seed)
+    return [_fill(rng.choice(SENTENCE_TEMPLATES), rng) for _ in range(count)]
+
+def long_articles(count, paragraphs=8, sentences_per_paragraph=6, seed=0):
+    """Multi-paragraph news articles"""
+    rng = random.Random(seed)
+    articles = []
+    for _ in range(count):
+        article = []
+        for _ in range(paragraphs):
+            article.append(" ".join(_fill(rng.choice(SENTENCE_TEMPLATES), rng)
+                                    for _ in range(sentences_per_paragraph)))
+        articles.append("\n\n".join(article))
+    return articles
+
+def rfp_documents(count, sentences=20, seed=0):
+    """Contracting text dense with NAICS and PSC codes"""
+    rng = random.Random(seed)
+    return [" ".join(_fill(rng.choice(RFP_TEMPLATES), rng) for _ in range(sentences))
+            for _ in range(count)]
+
+CORPORA = {
+    "short": short_sentences,
+    "long": long_articles,
+    "rfp": rfp_documents,
+}
+
+def make_corpus(kind, count, seed=0):
+    """Build a corpus by name (short, long or rfp)"""
+    return CORPORA[kind](count, seed=seed)
@@ -0,0 +1,67 @@
+"""
+Timing helpers shared by the benchmark scripts
+"""
+import platform
+import resource
+import sys
+import time
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+def time_call(fn, *args, **kwargs):
+    """Run fn once and return (result, seconds)"""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def measure(process_one, texts, token_counts, warmup=1):
+    """
+    Call process_one(text) for every text and collect throughput and latency stats
+    token_counts gives the number of tokens in each text (for tokens/sec).
+    """
+    for text in texts[:warmup]:
+        process_one(text)
+    
+    latencies = []
+    start = time.perf_counter()
+    for text in texts:
+        call_start = time.perf_counter()
+        process_one(text)
+        latencies.append(time.perf_counter() - call_start)
+    elapsed = time.perf_counter() - start
+    
+    return {
+        "docs": len(texts),
+        "tokens": sum(token_counts),
+        "seconds": elapsed,
+        "docs_per_sec": len(texts) / elapsed if elapsed else 0.0,
+        "tokens_per_sec": sum(token_counts) / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            "p50": percentile(latencies, 50) * 1000,
+            "p95": percentile(latencies, 95) * 1000,
+            "p99": percentile(latencies, 99) * 1000,
+        },
+    }
+
+def environment_info():
+    """Versions that matter when comparing results between releases"""
+    import spacy
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "spacy": spacy.__version__,
+    }
@@ -0,0 +1,126 @@
+"""
+Throughput and latency benchmarks for the three entry points:
+    extract   - extract_entities_enhanced
+    custom    - CustomEntityTrainer.test_model
+    naics     - NAICSPSCTrainer.test_model
+
+Usage:
+    python benchmarks/run_benchmarks.py --entry extract --corpus short long --docs 200
+    python benchmarks/run_benchmarks.py --entry naics --corpus rfp --output results.json
+
+Results are printed and written as JSON so runs can be compared between releases.
+"""
+import argparse
+import contextlib
+import io
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import spacy
+
+from corpus import CORPORA, make_corpus
+from harness import environment_info, measure, peak_rss_mb, time_call
+
+def setup_extract(args):
+    """Load the enhanced extractor pipeline and return (process_one, load_seconds)"""
+    from enhanced_entity_extractor_CustomEntity import extract_entities_enhanced, pipeline_registry
+    
+    _, load_seconds = time_call(pipeline_registry.get, args.model)
+    return (lambda text: extract_entities_enhanced(text, model_name=args.model)), load_seconds
+
+def setup_custom(args):
+    """Load a CustomEntityTrainer (base or trained model)"""
+    from custom_entity_training import CustomEntityTrainer
+    
+    def load():
+        with contextlib.redirect_stdout(io.StringIO()):
+            trainer = CustomEntityTrainer(args.model)
+            if args.custom_model:
+                trainer.load_custom_model(args.custom_model)
+        return trainer
+    
+    trainer, load_seconds = time_call(load)
+    
+    def process_one(text):
+        with contextlib.redirect_stdout(io.StringIO()):
+            trainer.test_model([text])
+    
+    return process_one, load_seconds
+
+def setup_naics(args):
+    """Load a NAICSPSCTrainer (untrained blank model unless --naics-model is given)"""
+    from naics_psc_trainer import NAICSPSCTrainer
+    
+    def load():
+        with contextlib.redirect_stdout(io.StringIO()):
+            trainer = NAICSPSCTrainer()
+            trainer.create_naics_psc_database()
+            if args.naics_model:
+                trainer.load_model_with_metadata(args.naics_model)
+            else:
+                trainer.nlp.initialize()
+        return trainer
+    
+    trainer, load_seconds = time_call(load)
+    
+    def process_one(text):
+        with contextlib.redirect_stdout(io.StringIO()):
+            trainer.test_model([text])
+    
+    return process_one, load_seconds
+
+ENTRY_POINTS = {
+    "extract": setup_extract,
+    "custom": setup_custom,
+    "naics": setup_naics,
+}
+
+def run(args):
+    """Run every requested entry point over every requested corpus"""
+    tokenizer = spacy.blank("en").tokenizer
+    report = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "environment": environment_info(),
+              "docs": args.docs, "seed": args.seed, "results": []}
+    
+    for entry in args.entry:
+        process_one, load_seconds = ENTRY_POINTS[entry](args)
+        for kind in args.corpus:
+            texts = make_corpus(kind, args.docs, seed=args.seed)
+            token_counts = [len(tokenizer(text)) for text in texts]
+            stats = measure(process_one, texts, token_counts)
+            stats.update({"entry": entry, "corpus": kind, "model_load_sec": load_seconds,
+                          "peak_rss_mb": peak_rss_mb()})
+            report["results"].append(stats)
+            print(f"{entry:>8} / {kind:<6} {stats['docs_per_sec']:9.1f} docs/s "
+                  f"{stats['tokens_per_sec']:10.1f} tok/s  "
+                  f"p50={stats['latency_ms']['p50']:.2f}ms p95={stats['latency_ms']['p95']:.2f}ms "
+                  f"p99={stats['latency_ms']['p99']:.2f}ms  load={load_seconds:.2f}s "
+                  f"rss={stats['peak_rss_mb']:.0f}MB")
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the NER entry points")
+    parser.add_argument("--entry", nargs="+", choices=sorted(ENTRY_POINTS), default=["extract"])
+    parser.add_argument("--corpus", nargs="+", choices=sorted(CORPORA), default=["short", "long"])
+    parser.add_argument("--docs", type=int, default=200, help="documents per corpus")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--model", default="en_core_web_sm", help="base spaCy model")
+    parser.add_argument("--custom-model", help="trained CustomEntityTrainer model directory")
+    parser.add_argument("--naics-model", help="trained NAICSPSCTrainer model directory")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+    
+    report = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
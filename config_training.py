@@ -0,0 +1,105 @@
+import random
+from pathlib import Path
+
+import spacy
+from spacy.cli.init_config import init_config
+from spacy.cli.train import train as spacy_train
+from spacy.tokens import DocBin
+from spacy.training import Example
+from spacy.util import load_config
+
+from training_corpus import training_data_to_docbin
+
+def split_train_dev(training_data, dev_fraction=0.2, seed=0):
+    """
+    Deterministically split examples into train and dev sets
+    (at least one dev example whenever there are two or more examples)
+    """
+    examples = list(training_data)
+    random.Random(seed).shuffle(examples)
+    dev_size = int(len(examples) * dev_fraction)
+    if dev_fraction > 0 and len(examples) > 1:
+        dev_size = max(1, dev_size)
+    return examples[dev_size:], examples[:dev_size]
+
+def write_corpora(nlp, training_data, output_dir, dev_fraction=0.2, seed=0, extra_train=()):
+    """
+    Write train.spacy and dev.spacy DocBin corpora for spacy train
+    training_data is (text, annotations) pairs or Examples, whose reference Docs
+    are written as they are. extra_train (e.g. rehearsal Examples) only goes into
+    the train split. Returns (train_path, dev_path).
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    train_data, dev_data = split_train_dev(training_data, dev_fraction, seed)
+    train_data += list(extra_train)
+
+    paths = []
+    for name, data in (("train", train_data), ("dev", dev_data)):
+        if data and isinstance(data[0], Example):
+            doc_bin = DocBin(docs=[example.reference for example in data])
+        else:
+            doc_bin, _ = training_data_to_docbin(nlp, data)
+        path = output_dir / f"{name}.spacy"
+        doc_bin.to_disk(path)
+        paths.append(path)
+    return tuple(paths)
+
+def build_training_config(train_path, dev_path, source_model=None, trainable=("ner",),
+                          max_epochs=0, max_steps=20000, patience=1600, eval_frequency=200,
+                          accumulate_gradient=1, batch_start=100, batch_stop=1000, seed=0):
+    """
+    Build a spaCy v3 training config for NER
+    Without source_model, a fresh tok2vec + ner pipeline is trained from scratch.
+    With source_model (a saved model directory), every component is copied from it and
+    only the trainable ones are updated - the rest are frozen, so fine-tuning keeps them.
+    Batch sizes compound from batch_start to batch_stop words, and training stops
+    early once the dev score hasn't improved for `patience` steps.
+    """
+    config = init_config(lang="en", pipeline=["ner"], optimize="efficiency")
+
+    if source_model is not None:
+        # Only the component names are needed here, so don't load any weights
+        source_config = load_config(Path(source_model) / "config.cfg")
+        pipe_names = list(source_config["nlp"]["pipeline"])
+        config["nlp"]["pipeline"] = pipe_names
+        config["components"] = {name: {"source": str(source_model)} for name in pipe_names}
+        # Components the source ships disabled (e.g. senter) stay disabled
+        config["nlp"]["disabled"] = list(source_config["nlp"].get("disabled", []))
+        frozen = [name for name in pipe_names if name not in trainable]
+        config["training"]["frozen_components"] = frozen
+        # A frozen shared tok2vec still has to run so listening components get its output
+        config["training"]["annotating_components"] = [
+            name for name in frozen
+            if source_config["components"][name].get("factory") in ("tok2vec", "transformer")
+        ]
+        config["initialize"]["vectors"] = None
+
+    config["paths"]["train"] = str(train_path)
+    config["paths"]["dev"] = str(dev_path)
+    config["system"]["seed"] = seed
+
+    training = config["training"]
+    training["max_epochs"] = max_epochs
+    training["max_steps"] = max_steps
+    training["patience"] = patience
+    training["eval_frequency"] = eval_frequency
+    training["accumulate_gradient"] = accumulate_gradient
+    training["batcher"]["size"]["start"] = batch_start
+    training["batcher"]["size"]["stop"] = batch_stop
+    return config
+
+def run_config_training(config_path, output_path=None, overrides=None, use_gpu=-1):
+    """
+    Train with the standard spaCy engine (same as `spacy train`): compounding batch
+    sizes, gradient accumulation, early stopping on the dev score and best-model
+    checkpointing. output_path defaults to an "output" directory next to the config.
+    Returns (nlp, best_model) - the best model by dev score, loaded, and its path.
+    """
+    config_path = Path(config_path)
+    output_path = Path(output_path) if output_path else config_path.parent / "output"
+    print(f"🎓 Training with {config_path}...")
+    spacy_train(config_path, output_path, use_gpu=use_gpu, overrides=overrides or {})
+    best_model = output_path / "model-best"
+    print(f"✅ Training completed! Best model: {best_model}")
+    return spacy.load(best_model), best_model
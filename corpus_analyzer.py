@@ -0,0 +1,171 @@
+import json
+from collections import namedtuple
+from pathlib import Path
+
+from enhanced_entity_extractor_CustomEntity import doc_to_result, get_pipeline
+
+# One unit of work: doc_id identifies the source document,
+# offset is where this text starts (in characters) inside that document
+CorpusDocument = namedtuple("CorpusDocument", ["doc_id", "text", "offset"])
+
+TEXT_SUFFIXES = {".txt", ".text", ".md"}
+JSONL_SUFFIXES = {".jsonl", ".ndjson"}
+
+def split_long_line(line, max_chars):
+    """
+    Split a line longer than max_chars into pieces of at most max_chars, breaking
+    after the last whitespace that fits (or hard at max_chars if there is none)
+    """
+    while len(line) > max_chars:
+        cut = max(line.rfind(" ", 0, max_chars), line.rfind("\t", 0, max_chars)) + 1
+        if cut <= 0:
+            cut = max_chars
+        yield line[:cut]
+        line = line[cut:]
+    if line:
+        yield line
+
+def iter_line_chunks(lines, max_chars=200_000):
+    """
+    Group lines into chunks of whole paragraphs, never more than max_chars
+    Lines longer than max_chars are split at whitespace first. Yields (text, offset)
+    pairs where offset is the character position of the chunk in the joined lines.
+    """
+    buffer = []
+    buffer_chars = 0
+    chunk_start = 0
+    position = 0
+
+    for line in lines:
+        for piece in split_long_line(line, max_chars):
+            # Flush at a paragraph break (blank line) once the chunk is big enough,
+            # or at any line break if a paragraph alone would overflow the chunk
+            at_paragraph_break = not piece.strip()
+            if buffer and (buffer_chars + len(piece) > max_chars or
+                           (at_paragraph_break and buffer_chars >= max_chars // 2)):
+                yield "".join(buffer), chunk_start
+                buffer = []
+                buffer_chars = 0
+                chunk_start = position
+
+            buffer.append(piece)
+            buffer_chars += len(piece)
+            position += len(piece)
+
+    if buffer:
+        yield "".join(buffer), chunk_start
+
+def iter_paragraph_chunks(path, max_chars=200_000):
+    """
+    Stream a text file as chunks of whole paragraphs, never more than max_chars
+    Yields (text, offset) pairs where offset is the character position of the
+    chunk in the original file.
+    """
+    # newline="" keeps "\r\n" intact so offsets match the file exactly
+    with open(path, 'r', encoding='utf-8', newline="") as file:
+        yield from iter_line_chunks(file, max_chars)
+
+def iter_jsonl_documents(path, text_field="text", id_field="id", max_chars=200_000):
+    """
+    Stream documents from a JSONL shard, one JSON object per line
+    Lines without an id get "<file>:<line number>". Long texts are chunked like
+    text files, with offsets into the record's text.
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        for line_number, line in enumerate(file, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            doc_id = str(record.get(id_field, f"{path}:{line_number}"))
+            text = record[text_field]
+            for chunk, offset in iter_line_chunks(text.splitlines(keepends=True), max_chars):
+                yield CorpusDocument(doc_id, chunk, offset)
+
+def iter_documents(source, max_chars=200_000, text_field="text", id_field="id"):
+    """
+    Stream every document under source: a directory (walked recursively, in sorted
+    order), a JSONL shard, or a plain-text file. Large files and JSONL texts are
+    split into paragraph chunks of at most max_chars so memory stays bounded.
+    """
+    source = Path(source)
+    if source.is_dir():
+        paths = sorted(path for path in source.rglob("*")
+                       if path.is_file() and path.suffix.lower() in TEXT_SUFFIXES | JSONL_SUFFIXES)
+    else:
+        paths = [source]
+
+    for path in paths:
+        if path.suffix.lower() in JSONL_SUFFIXES:
+            yield from iter_jsonl_documents(path, text_field, id_field, max_chars)
+        else:
+            for text, offset in iter_paragraph_chunks(path, max_chars):
+                yield CorpusDocument(str(path), text, offset)
+
+def analyze_corpus(source, output_path, model_name="en_core_web_sm", batch_size=64,
+                   n_process=1, max_chars=200_000, entities_only=False, gazetteer_path=None,
+                   aggregate=None, checkpoint_path=None, checkpoint_every=1000,
+                   docbin_writer=None):
+    """
+    Analyze a whole corpus and write one JSON line per document chunk to output_path
+    Entity offsets are remapped to positions in the original document.
+    Results are written as they are produced, so memory use doesn't grow with corpus size.
+    As elsewhere, set entities_only=True to skip the tagger, parser, lemmatizer etc. -
+    the entities are the same, and large corpora go through much faster.
+
+    Pass an EntityAggregate (see entity_aggregates.py) to also count entities;
+    chunks it has already counted are skipped and new results are appended to
+    output_path. With checkpoint_path the aggregate is saved every checkpoint_every
+    chunks and at the end, so an interrupted run can be resumed (output lines written
+    after the last checkpoint may then appear twice).
+
+    Pass a DocBinWriter (see docbin_store.py) to also save every processed chunk.
+    """
+    nlp = get_pipeline(model_name, gazetteer_path, entities_only)
+    documents = ((document.text, (document.doc_id, document.offset))
+                 for document in iter_documents(source, max_chars)
+                 if aggregate is None or not aggregate.is_processed(chunk_id(document.doc_id, document.offset)))
+
+    stats = {"chunks": 0, "characters": 0, "entities": 0}
+    mode = 'a' if aggregate is not None and len(aggregate) else 'w'
+    with open(output_path, mode, encoding='utf-8') as out:
+        for doc, (doc_id, offset) in nlp.pipe(documents, as_tuples=True,
+                                              batch_size=batch_size, n_process=n_process):
+            if docbin_writer is not None:
+                docbin_writer.add(doc)
+            result = doc_to_result(doc)
+            entities = [{"text": text, "label": label, "start": start + offset, "end": end + offset}
+                        for text, label, start, end in zip(result.texts, result.labels,
+                                                           result.starts, result.ends)]
+            out.write(json.dumps({"id": doc_id, "offset": offset, "entities": entities}) + "\n")
+
+            stats["chunks"] += 1
+            stats["characters"] += len(doc.text)
+            stats["entities"] += len(entities)
+
+            if aggregate is not None:
+                aggregate.add(zip(result.texts, result.labels), chunk_id(doc_id, offset))
+                if checkpoint_path and stats["chunks"] % checkpoint_every == 0:
+                    out.flush()
+                    aggregate.save_checkpoint(checkpoint_path)
+
+    if aggregate is not None and checkpoint_path:
+        aggregate.save_checkpoint(checkpoint_path)
+    if docbin_writer is not None:
+        docbin_writer.flush()
+    return stats
+
+def chunk_id(doc_id, offset):
+    """Stable id for a document chunk, used to skip already-counted chunks"""
+    return f"{doc_id}#{offset}"
+
+def analyze_corpus_enhanced(source, output_path="corpus_entities.jsonl", **kwargs):
+    """
+    Friendly wrapper around analyze_corpus that reports progress
+    """
+    print(f"\n📚 Analyzing corpus: {source}")
+    stats = analyze_corpus(source, output_path, **kwargs)
+    print(f"✅ Processed {stats['chunks']} chunks ({stats['characters']:,} characters)")
+    print(f"   • Entities found: {stats['entities']}")
+    print(f"   • Results written to {output_path}")
+    return stats
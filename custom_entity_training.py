@@ -1,10 +1,15 @@
 import spacy
+from spacy.tokens import Span
 from spacy.training import Example
 from spacy.util import minibatch
 import random
 import json
 from pathlib import Path
 
+from config_training import build_training_config, run_config_training, write_corpora
+from evaluation import report_evaluation
+from training_corpus import example_labels, load_examples, load_training_json, save_training_corpus
+
 class CustomEntityTrainer:
     """
     A class to train spaCy models with custom entities
@@ -21,6 +26,9 @@ class CustomEntityTrainer:
             print(f"❌ Model {model_name} not found. Creating blank model...")
             self.nlp = spacy.blank("en")
         
+        # Remember whether there is already a trained ner we can fine-tune
+        self.has_trained_ner = "ner" in self.nlp.pipe_names
+        
         # Get or create the NER component
         if "ner" not in self.nlp.pipe_names:
             ner = self.nlp.add_pipe("ner", last=True)
@@ -104,54 +112,176 @@ class CustomEntityTrainer:
         for label in labels:
             self.ner.add_label(label)
     
+    def build_training_corpus(self, training_data, path="./custom_training.spacy"):
+        """
+        Convert training data once into a .spacy (DocBin) corpus on disk
+        training_data can be (text, annotations) pairs or a training JSON file
+        like the one from create_training_data_template.
+        """
+        if isinstance(training_data, (str, Path)):
+            training_data = load_training_json(training_data)
+        count, skipped = save_training_corpus(self.nlp, training_data, path)
+        print(f"💾 Saved {count} training examples to {path}")
+        if skipped:
+            print(f"⚠️  Skipped {skipped} entities that don't match token boundaries")
+        return path
+    
     def train_model(self, training_data, iterations=30):
         """
         Train the model with custom entity data
         This is where the magic happens!
+        training_data can be (text, annotations) pairs, Examples, or the path to
+        a .spacy corpus (see build_training_corpus) or training JSON file.
+        A base model that already has a trained ner is fine-tuned (see fine_tune)
+        instead of having its weights reset.
         """
+        if self.has_trained_ner:
+            return self.fine_tune(training_data, iterations)
+        
         print(f"🎓 Training model for {iterations} iterations...")
         print("This might take a few minutes - grab a snack! ☕")
         
-        # Add labels from training data
-        labels = set()
-        for text, annotations in training_data:
-            for start, end, label in annotations["entities"]:
-                labels.add(label)
+        # Tokenize and align everything once - the Examples are reused every iteration
+        examples = load_examples(self.nlp, training_data)
         
-        self.add_custom_labels(labels)
+        # Add labels from training data
+        self.add_custom_labels(example_labels(examples))
         
         # Disable other pipes during training for efficiency
         other_pipes = [pipe for pipe in self.nlp.pipe_names if pipe != "ner"]
-        with self.nlp.disable_pipes(*other_pipes):
+        with self.nlp.select_pipes(disable=other_pipes):
             
             # Initialize the model's weights randomly
-            self.nlp.begin_training()
+            optimizer = self.nlp.initialize(lambda: examples)
             
             for iteration in range(iterations):
                 print(f"  Iteration {iteration + 1}/{iterations}...")
                 
                 # Shuffle training data
-                random.shuffle(training_data)
+                random.shuffle(examples)
                 losses = {}
                 
-                # Create training batches
-                for batch in minibatch(training_data, size=2):
-                    examples = []
-                    for text, annotations in batch:
-                        # Create Example objects
-                        doc = self.nlp.make_doc(text)
-                        example = Example.from_dict(doc, annotations)
-                        examples.append(example)
-                    
-                    # Update the model
-                    self.nlp.update(examples, losses=losses)
+                # Create training batches and update the model
+                for batch in minibatch(examples, size=2):
+                    self.nlp.update(batch, sgd=optimizer, losses=losses)
                 
                 # Print progress every 10 iterations
                 if (iteration + 1) % 10 == 0:
                     print(f"    Losses: {losses}")
         
+        self.has_trained_ner = True
         print("✅ Training completed!")
     
+    def _own_ner_tok2vec(self):
+        """Give the ner its own copy of a shared tok2vec, so that can stay frozen"""
+        for name, component in self.nlp.pipeline:
+            if "ner" in getattr(component, "listening_components", []):
+                self.nlp.replace_listeners(name, "ner", ["model.tok2vec"])
+    
+    def _rehearsal_examples(self, examples, rehearsal_texts):
+        """
+        Pseudo-label with the current (base) model before any update
+        Returns (examples, rehearsal): copies of the examples whose gold annotation
+        also holds the standard entities the base model finds wherever it has none
+        (the caller's Examples are left as they are), and extra rehearsal texts as
+        examples annotated entirely by the base model.
+        """
+        texts = [example.reference.text for example in examples]
+        labelled = []
+        for example, predicted in zip(examples, self.nlp.pipe(texts)):
+            reference = example.reference.copy()
+            taken = {i for ent in reference.ents for i in range(ent.start, ent.end)}
+            pseudo = [Span(reference, ent.start, ent.end, label=ent.label_) for ent in predicted.ents
+                      if not any(i in taken for i in range(ent.start, ent.end))]
+            if pseudo:
+                reference.set_ents(pseudo, default="unmodified")
+            labelled.append(Example(self.nlp.make_doc(reference.text), reference))
+        
+        rehearsal = [Example(self.nlp.make_doc(doc.text), doc)
+                     for doc in self.nlp.pipe(rehearsal_texts or [])]
+        return labelled, rehearsal
+    
+    def fine_tune(self, training_data, iterations=10, rehearsal_texts=None,
+                  rehearsal_ratio=1.0, batch_size=8, drop=0.2):
+        """
+        Teach the existing ner new labels without starting over
+        Training resumes from the current weights (resume_training), only the ner is
+        updated, and rehearsal keeps the standard labels (PERSON, ORG, GPE...) from
+        being forgotten: the base model's own predictions on the training texts and on
+        rehearsal_texts are mixed in. Each iteration uses up to rehearsal_ratio
+        rehearsal examples per training example.
+        """
+        print(f"🎓 Fine-tuning for {iterations} iterations...")
+        
+        examples = load_examples(self.nlp, training_data)
+        labels = example_labels(examples)
+        self._own_ner_tok2vec()
+        examples, rehearsal = self._rehearsal_examples(examples, rehearsal_texts)
+        self.add_custom_labels(labels)
+        
+        rehearsal_size = min(len(rehearsal), int(len(examples) * rehearsal_ratio))
+        losses = {}
+        with self.nlp.select_pipes(enable="ner"):
+            optimizer = self.nlp.resume_training()
+            for iteration in range(iterations):
+                batch_examples = examples + random.sample(rehearsal, rehearsal_size)
+                random.shuffle(batch_examples)
+                losses = {}
+                for batch in minibatch(batch_examples, size=batch_size):
+                    self.nlp.update(batch, sgd=optimizer, drop=drop, losses=losses)
+                print(f"  Iteration {iteration + 1}/{iterations} - loss {losses.get('ner', 0.0):.2f}")
+        
+        self.has_trained_ner = True
+        print("✅ Fine-tuning completed!")
+        return losses
+    
+    def export_config_training(self, training_data, output_dir="./custom_ner_training",
+                               dev_fraction=0.2, rehearsal_texts=None, **config_settings):
+        """
+        Write a spaCy v3 config.cfg plus train/dev DocBin corpora for `spacy train`
+        The current model (with the custom labels added) is saved as the source, so
+        its ner is fine-tuned while the other components stay frozen. As in fine_tune,
+        the corpora are pseudo-labelled by that model first and rehearsal_texts are
+        added to the train split, so the standard labels aren't forgotten.
+        Extra keyword arguments (max_epochs, patience, accumulate_gradient...) go into the config.
+        """
+        print(f"📝 Exporting config-driven training setup to {output_dir}...")
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        # Pairs, Examples, a training JSON file or a .spacy corpus
+        examples = load_examples(self.nlp, training_data)
+        labels = example_labels(examples)
+        rehearsal = []
+        if self.has_trained_ner:
+            examples, rehearsal = self._rehearsal_examples(examples, rehearsal_texts)
+        self.add_custom_labels(labels)
+        if self.has_trained_ner:
+            source_model = output_dir / "base_model"
+            self.nlp.to_disk(source_model)
+        else:
+            # A brand new ner has no weights to fine-tune yet - train from scratch
+            source_model = None
+        
+        train_path, dev_path = write_corpora(self.nlp, examples, output_dir, dev_fraction,
+                                             extra_train=rehearsal)
+        config = build_training_config(train_path, dev_path, source_model=source_model,
+                                       **config_settings)
+        config_path = output_dir / "config.cfg"
+        config.to_disk(config_path)
+        
+        print(f"✅ Wrote {config_path}, {train_path.name} and {dev_path.name}")
+        return config_path
+    
+    def train_with_config(self, config_path, output_path=None, overrides=None):
+        """
+        Train with the standard spaCy engine (see config_training.run_config_training)
+        and load the best model into this trainer
+        """
+        self.nlp, best_model = run_config_training(config_path, output_path, overrides)
+        self.ner = self.nlp.get_pipe("ner")
+        self.has_trained_ner = True
+        return best_model
+    
     def save_model(self, path="./custom_ner_model"):
         """Save the trained model"""
         print(f"💾 Saving model to {path}...")
@@ -162,6 +292,8 @@ class CustomEntityTrainer:
         """Load a previously trained model"""
         print(f"📂 Loading custom model from {path}...")
         self.nlp = spacy.load(path)
+        self.ner = self.nlp.get_pipe("ner")
+        self.has_trained_ner = True
         print("✅ Custom model loaded!")
     
     def test_model(self, test_texts):
@@ -169,8 +301,7 @@ class CustomEntityTrainer:
         print("🧪 Testing custom entity recognition...")
         print("=" * 60)
         
-        for text in test_texts:
-            doc = self.nlp(text)
+        for text, doc in zip(test_texts, self.nlp.pipe(test_texts)):
             print(f"\nText: '{text}'")
             print("Entities found:")
             
@@ -184,6 +315,14 @@ class CustomEntityTrainer:
             else:
                 print("  No entities detected")
         print("=" * 60)
+    
+    def evaluate(self, dataset, batch_size=256, n_process=1):
+        """
+        Precision/recall/F1 per label on gold-annotated data (pairs, Examples,
+        a .spacy corpus or a training JSON file), plus docs/sec
+        """
+        print("📏 Evaluating custom entity recognition...")
+        return report_evaluation(self.nlp, dataset, batch_size, n_process)
 
 def create_training_data_template():
     """
@@ -310,13 +449,14 @@ def student_friendly_trainer():
     print("🎓 Great job! Your custom model is ready to use!")
 
 if __name__ == "__main__":
-    print("Choose your training mode:")
-    print("1. Full demonstration (recommended)")
-    print("2. Student-friendly version")
+    import argparse
     
-    choice = input("Enter 1 or 2: ").strip()
+    parser = argparse.ArgumentParser(description="Custom entity training demos (see ner_cli.py train for real jobs)")
+    parser.add_argument("--mode", choices=["full", "student"], default="full",
+                        help="full demonstration (default) or the student-friendly version")
+    args = parser.parse_args()
     
-    if choice == "2":
+    if args.mode == "student":
         student_friendly_trainer()
     else:
         main_demo()
@@ -326,4 +466,4 @@ if __name__ == "__main__":
     print("2. Experiment with different entity types")
     print("3. Test on articles from your local newspaper")
     print("4. Share your custom model with classmates!")
-    print("\nYou're now a custom NLP model trainer! 🚀")
\ No newline at end of file
+    print("\nYou're now a custom NLP model trainer! 🚀")
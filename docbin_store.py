@@ -0,0 +1,91 @@
+from pathlib import Path
+
+import spacy
+from spacy.tokens import DocBin
+
+from enhanced_entity_extractor_CustomEntity import doc_to_result
+
+SHARD_SUFFIX = ".spacy"
+
+class DocBinWriter:
+    """
+    Write processed Docs (including the custom PRODUCT/EVENT ents) as sharded DocBin files
+    Each shard holds up to docs_per_shard documents, so neither writing nor
+    reading ever needs the whole collection in memory.
+
+        with DocBinWriter("processed_docs") as writer:
+            for doc in nlp.pipe(texts):
+                writer.add(doc)
+    """
+
+    def __init__(self, directory, docs_per_shard=1000, store_user_data=False, prefix="shard"):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.docs_per_shard = docs_per_shard
+        self.store_user_data = store_user_data
+        self.prefix = prefix
+        self.shard_paths = []
+        self.docs_written = 0
+        self._current = None
+        self._next_shard = len(list(self.directory.glob(f"{prefix}-*{SHARD_SUFFIX}")))
+
+    def _new_docbin(self):
+        return DocBin(store_user_data=self.store_user_data)
+
+    def add(self, doc):
+        """Queue a Doc, writing out the shard once it is full"""
+        if self._current is None:
+            self._current = self._new_docbin()
+        self._current.add(doc)
+        self.docs_written += 1
+        if len(self._current) >= self.docs_per_shard:
+            self.flush()
+
+    def flush(self):
+        """Write the current (possibly partial) shard to disk"""
+        if self._current is None or len(self._current) == 0:
+            return None
+        path = self.directory / f"{self.prefix}-{self._next_shard:05d}{SHARD_SUFFIX}"
+        self._current.to_disk(path)
+        self.shard_paths.append(path)
+        self._next_shard += 1
+        self._current = None
+        return path
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def shard_paths(path):
+    """The DocBin shards at path (a single .spacy file or a directory of shards)"""
+    path = Path(path)
+    if path.is_dir():
+        return sorted(path.glob(f"*{SHARD_SUFFIX}"))
+    return [path]
+
+def iter_docbin_docs(path, vocab=None):
+    """
+    Lazily load Docs back from DocBin shards, one shard at a time
+    No model is needed - a blank vocab is enough to restore text, tokens and entities.
+    """
+    if vocab is None:
+        vocab = spacy.blank("en").vocab
+    for shard in shard_paths(path):
+        doc_bin = DocBin().from_disk(shard)
+        yield from doc_bin.get_docs(vocab)
+
+def count_docbin_docs(path):
+    """Number of documents stored across all shards"""
+    return sum(len(DocBin().from_disk(shard)) for shard in shard_paths(path))
+
+def iter_entity_results(path, vocab=None):
+    """
+    Re-read the entities of stored Docs as EntityResults, without running any model
+    """
+    for doc in iter_docbin_docs(path, vocab):
+        yield doc_to_result(doc)
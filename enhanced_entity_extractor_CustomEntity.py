@@ -1,142 +1,705 @@
 import spacy
-from spacy.matcher import Matcher
+from spacy.language import Language
+from spacy.matcher import Matcher, PhraseMatcher
 from spacy.tokens import Span
-from collections import Counter
+from array import array
+from collections import Counter, OrderedDict, deque
+from dataclasses import dataclass
+from functools import lru_cache
+import hashlib
+import json
 import re
+import threading
+from pathlib import Path
 
-def setup_custom_entity_matcher(nlp):
-    """
-    Set up custom patterns to recognize PRODUCT and EVENT entities
-    This extends spaCy's built-in capabilities!
-    """
-    matcher = Matcher(nlp.vocab)
+from pipeline_metrics import stage_timer
+from result_cache import pipeline_content_hash, pipeline_fingerprint
+
+try:  # spaCy 3.8+ registers its built-in factories lazily
+    from spacy.registrations import populate_registry
+except ImportError:
+    populate_registry = None
+
+# Bump this whenever the patterns in setup_custom_entity_matcher change,
+# so cached pipelines built from the old patterns are not reused
+PATTERN_SET_VERSION = "2"
+
+# Keyword-anchored rules: (label, keywords, tail)
+# Keywords are matched with a PhraseMatcher on LOWER, then the tail says which
+# tokens may follow: "?" = optional, "*" = any number, "" = exactly one
+KEYWORD_RULES = [
+    # Tech products: "iPhone 15", "Galaxy S24", "MacBook Pro"
+    ("PRODUCT", ["iphone", "ipad", "macbook", "imac", "airpods", "galaxy", "pixel"],
+     [("IS_ALPHA", "?"), ("LIKE_NUM", "?")]),
     
-    # PRODUCT patterns - common product naming conventions
-    product_patterns = [
-        # Tech products: "iPhone 15", "Galaxy S24", "MacBook Pro"
-        [{"LOWER": {"IN": ["iphone", "ipad", "macbook", "imac", "airpods", "galaxy", "pixel"]}},
-         {"IS_ALPHA": True, "IS_SPACE": False, "OP": "?"},  # Optional model number/name
-         {"LIKE_NUM": True, "OP": "?"}],  # Optional number
-        
-        # Car models: "Tesla Model S", "Ford F-150"
-        [{"LOWER": {"IN": ["model", "f-150", "mustang", "camry", "accord", "civic"]}},
-         {"IS_ALPHA": True, "OP": "*"}],
-        
-        # Software: "Windows 11", "iOS 17", "Android 14"
-        [{"LOWER": {"IN": ["windows", "ios", "android", "macos", "linux"]}},
-         {"LIKE_NUM": True, "OP": "?"}],
-        
-        # Gaming: "PlayStation 5", "Xbox Series X", "Nintendo Switch"
-        [{"LOWER": {"IN": ["playstation", "xbox", "nintendo"]}},
-         {"IS_ALPHA": True, "OP": "*"}],
-        
+    # Car models: "Tesla Model S", "Ford F-150"
+    ("PRODUCT", ["model", "f-150", "mustang", "camry", "accord", "civic"],
+     [("IS_ALPHA", "*")]),
+    
+    # Software: "Windows 11", "iOS 17", "Android 14"
+    ("PRODUCT", ["windows", "ios", "android", "macos", "linux"],
+     [("LIKE_NUM", "?")]),
+    
+    # Gaming: "PlayStation 5", "Xbox Series X", "Nintendo Switch"
+    ("PRODUCT", ["playstation", "xbox", "nintendo"],
+     [("IS_ALPHA", "*")]),
+    
+    # Sports events: "Super Bowl", "World Cup", "Olympics"
+    ("EVENT", [f"{first} {second}"
+               for first in ["super", "world", "winter", "summer"]
+               for second in ["bowl", "cup", "olympics", "games", "series", "championship"]],
+     []),
+    
+    # Awards: "Academy Awards", "Emmy Awards", "Grammy Awards"
+    ("EVENT", [f"{first} {second}"
+               for first in ["academy", "emmy", "grammy", "golden", "nobel"]
+               for second in ["awards", "prize", "ceremony", "globes"]],
+     []),
+    
+    # General events with keywords
+    ("EVENT", ["festival", "conference", "summit", "expo", "fair"],
+     [("LIKE_NUM", "?")]),
+]
+
+# Patterns that can't be anchored on a keyword stay in the token Matcher
+RESIDUAL_PATTERNS = {
+    "PRODUCT": [
         # Generic product pattern: "Brand Name + Product"
         [{"ENT_TYPE": "ORG"},  # Company name
          {"IS_ALPHA": True, "LENGTH": {">=": 3}},  # Product name
          {"LIKE_NUM": True, "OP": "?"}]  # Optional version number
-    ]
-    
-    # EVENT patterns - common event naming conventions  
-    event_patterns = [
-        # Sports events: "Super Bowl", "World Cup", "Olympics"
-        [{"LOWER": {"IN": ["super", "world", "winter", "summer"]}},
-         {"LOWER": {"IN": ["bowl", "cup", "olympics", "games", "series", "championship"]}}],
-        
+    ],
+    "EVENT": [
         # Conferences: "WWDC 2024", "CES 2024", "E3"
         [{"IS_UPPER": True, "LENGTH": {">=": 2, "<=": 5}},  # Acronym
          {"LIKE_NUM": True, "OP": "?"}],  # Optional year
         
-        # Awards: "Academy Awards", "Emmy Awards", "Grammy Awards"
-        [{"LOWER": {"IN": ["academy", "emmy", "grammy", "golden", "nobel"]}},
-         {"LOWER": {"IN": ["awards", "prize", "ceremony", "globes"]}}],
-        
         # Elections: "2024 Presidential Election", "Midterm Elections"
         [{"LIKE_NUM": True, "OP": "?"},  # Optional year
          {"LOWER": {"IN": ["presidential", "midterm", "general", "primary"]}},
-         {"LOWER": {"IN": ["election", "elections", "race"]}}],
-        
-        # General events with keywords
-        [{"LOWER": {"IN": ["festival", "conference", "summit", "expo", "fair"]}},
-         {"LIKE_NUM": True, "OP": "?"}]
+         {"LOWER": {"IN": ["election", "elections", "race"]}}]
     ]
+}
+
+# Token attributes the keyword tails can check
+TAIL_CHECKS = {
+    "IS_ALPHA": lambda token: token.is_alpha,
+    "LIKE_NUM": lambda token: token.like_num,
+}
+
+def load_gazetteer(path):
+    """
+    Load product/event names from a gazetteer file
+    Supports JSONL ({"label": "PRODUCT", "pattern": "Galaxy S24"}, like the
+    EntityRuler) or tab-separated lines ("PRODUCT<TAB>Galaxy S24").
+    Blank lines and lines starting with # are skipped; anything else that isn't
+    a valid entry raises ValueError naming the file and line.
+    """
+    entries = []
+    with open(path, 'r', encoding='utf-8') as file:
+        for line_number, line in enumerate(file, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                if line.startswith("{"):
+                    record = json.loads(line)
+                    label, phrase = record["label"], record["pattern"]
+                else:
+                    label, phrase = line.split("\t", 1)
+            except (ValueError, KeyError, TypeError):
+                raise ValueError(f"{path}:{line_number}: expected LABEL<TAB>phrase or "
+                                 f'{{"label": ..., "pattern": ...}}, got {line!r}') from None
+            entries.append((label.strip(), phrase.strip()))
+    return entries
+
+def gazetteer_fingerprint(gazetteer_path=None):
+    """
+    Version string for the active pattern set, including the gazetteer contents
+    """
+    if gazetteer_path is None:
+        return PATTERN_SET_VERSION
+    stat = Path(gazetteer_path).stat()
+    digest = _file_digest(str(gazetteer_path), stat.st_mtime_ns, stat.st_size)
+    return f"{PATTERN_SET_VERSION}+{digest}"
+
+@lru_cache(maxsize=32)
+def _file_digest(path, mtime_ns, size):
+    """Hash a file once per (path, modification time, size)"""
+    return hashlib.sha1(Path(path).read_bytes()).hexdigest()[:12]
+
+class CustomEntityMatcher:
+    """
+    PhraseMatcher fast path for keyword and gazetteer patterns,
+    plus a small token Matcher for the rules that need token attributes
+    Called like a Matcher: returns (match_id, start, end) tuples.
+    """
+    
+    def __init__(self, nlp, gazetteer=()):
+        self.vocab = nlp.vocab
+        self.phrase_matcher = PhraseMatcher(nlp.vocab, attr="LOWER")
+        self.matcher = Matcher(nlp.vocab)
+        self.gazetteer = list(gazetteer)
+        
+        # Each keyword rule gets its own match key so we know which tail to apply
+        self._rules = {}
+        for index, (label, keywords, tail) in enumerate(KEYWORD_RULES):
+            key = f"{label}__rule{index}"
+            self._rules[self.vocab.strings.add(key)] = (self.vocab.strings.add(label), tail)
+            self.phrase_matcher.add(key, list(nlp.tokenizer.pipe(keywords)))
+        
+        # Gazetteer names match exactly, with no tail
+        phrases_by_label = {}
+        for label, phrase in self.gazetteer:
+            phrases_by_label.setdefault(label, []).append(phrase)
+        for label, phrases in phrases_by_label.items():
+            key = f"{label}__gazetteer"
+            self._rules[self.vocab.strings.add(key)] = (self.vocab.strings.add(label), [])
+            self.phrase_matcher.add(key, list(nlp.tokenizer.pipe(phrases)))
+        
+        for label, patterns in RESIDUAL_PATTERNS.items():
+            self.matcher.add(label, patterns)
     
-    # Add patterns to matcher
-    matcher.add("PRODUCT", product_patterns)
-    matcher.add("EVENT", event_patterns)
+    def _tail_ends(self, doc, end, tail):
+        """All possible match ends after applying the tail rules"""
+        ends = {end}
+        for attr, op in tail:
+            check = TAIL_CHECKS[attr]
+            next_ends = set(ends) if op in ("?", "*") else set()
+            for position in ends:
+                while position < len(doc) and check(doc[position]):
+                    position += 1
+                    next_ends.add(position)
+                    if op != "*":
+                        break
+            ends = next_ends
+        return ends
     
-    return matcher
+    def __call__(self, doc):
+        matches = list(self.matcher(doc))
+        for key, start, end in self.phrase_matcher(doc):
+            label, tail = self._rules[key]
+            for tail_end in self._tail_ends(doc, end, tail):
+                matches.append((label, start, tail_end))
+        return matches
+
+def setup_custom_entity_matcher(nlp, gazetteer=()):
+    """
+    Set up custom patterns to recognize PRODUCT and EVENT entities
+    This extends spaCy's built-in capabilities!
+    Pass gazetteer entries (from load_gazetteer) to recognize thousands of known names.
+    """
+    return CustomEntityMatcher(nlp, gazetteer)
 
 def add_custom_entities(doc, matcher):
     """
     Add custom PRODUCT and EVENT entities to the document
+    Existing entities always win; among overlapping matches the longest one is kept.
     """
-    matches = matcher(doc)
+    return resolve_custom_matches(doc, matcher(doc))
+
+def resolve_custom_matches(doc, matches):
+    """
+    Write non-overlapping (match_id, start, end) matches into doc.ents
+    """
+    if not matches:
+        return doc
+    
+    # Mark the tokens already covered by existing entities
+    taken = bytearray(len(doc))
+    for ent in doc.ents:
+        taken[ent.start:ent.end] = b"\x01" * (ent.end - ent.start)
+    
+    # Longest matches first (then leftmost), like spacy.util.filter_spans,
+    # so each token is checked at most once per match instead of against every entity
     new_ents = []
+    for match_id, start, end in sorted(matches, key=lambda m: (m[1] - m[2], m[1])):
+        if any(taken[start:end]):
+            continue
+        taken[start:end] = b"\x01" * (end - start)
+        new_ents.append(Span(doc, start, end, label=match_id))
     
-    # Keep existing entities
-    existing_ents = [(ent.start, ent.end, ent.label_) for ent in doc.ents]
+    # Only the new spans are written; existing entities are left untouched
+    if new_ents:
+        doc.set_ents(new_ents, default="unmodified")
+    return doc
+
+class ProductEventRecognizer:
+    """
+    Pipeline component that adds PRODUCT and EVENT entities after the ner
+    Because it lives inside the pipeline, it is saved with the model
+    and runs inside nlp.pipe worker processes too!
+    """
     
-    # Add custom matches
-    for match_id, start, end in matches:
-        label = doc.vocab.strings[match_id]  # Get label name (PRODUCT or EVENT)
-        
-        # Check for overlaps with existing entities
-        span = doc[start:end]
-        overlaps = False
-        for ent_start, ent_end, _ in existing_ents:
-            if not (end <= ent_start or start >= ent_end):  # Check overlap
-                overlaps = True
-                break
+    def __init__(self, nlp, name="product_event_entities", gazetteer=()):
+        self.name = name
+        self.nlp = nlp
+        self.matcher = setup_custom_entity_matcher(nlp, gazetteer)
+    
+    def __call__(self, doc):
+        return add_custom_entities(doc, self.matcher)
+    
+    def to_disk(self, path, exclude=tuple()):
+        """Save the gazetteer entries alongside the model"""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        with open(path / "gazetteer.jsonl", "w", encoding="utf-8") as f:
+            for label, phrase in self.matcher.gazetteer:
+                f.write(json.dumps({"label": label, "pattern": phrase}) + "\n")
+    
+    def from_disk(self, path, exclude=tuple()):
+        """Rebuild the matcher from the saved gazetteer entries"""
+        gazetteer_file = Path(path) / "gazetteer.jsonl"
+        if gazetteer_file.exists():
+            self.matcher = setup_custom_entity_matcher(self.nlp, load_gazetteer(gazetteer_file))
+        return self
+
+@Language.factory(
+    "product_event_entities",
+    default_config={"pattern_version": PATTERN_SET_VERSION, "gazetteer_path": None},
+    assigns=["doc.ents", "token.ent_type", "token.ent_iob"],
+)
+def create_product_event_recognizer(nlp, name, pattern_version, gazetteer_path):
+    """Factory so the component can be added with nlp.add_pipe("product_event_entities")"""
+    # When loading a saved model the gazetteer comes from the model directory instead
+    gazetteer = ()
+    if gazetteer_path and Path(gazetteer_path).exists():
+        gazetteer = load_gazetteer(gazetteer_path)
+    return ProductEventRecognizer(nlp, name, gazetteer)
+
+def add_product_event_component(nlp, gazetteer_path=None):
+    """
+    Add the PRODUCT/EVENT component right after the ner (or last if there is no ner)
+    """
+    if "product_event_entities" in nlp.pipe_names:
+        return nlp.get_pipe("product_event_entities")
+    
+    config = {"pattern_version": gazetteer_fingerprint(gazetteer_path),
+              "gazetteer_path": str(gazetteer_path) if gazetteer_path else None}
+    if "ner" in nlp.pipe_names:
+        return nlp.add_pipe("product_event_entities", after="ner", config=config)
+    return nlp.add_pipe("product_event_entities", last=True, config=config)
+
+# Which pipeline output each token attribute in our patterns depends on
+# (lexical attributes like LOWER, IS_ALPHA or LIKE_NUM only need the tokenizer)
+ATTRIBUTE_REQUIREMENTS = {
+    "ENT_TYPE": "token.ent_type",
+    "ENT_IOB": "token.ent_iob",
+    "POS": "token.pos",
+    "TAG": "token.tag",
+    "MORPH": "token.morph",
+    "LEMMA": "token.lemma",
+    "DEP": "token.dep",
+    "HEAD": "token.head",
+    "IS_SENT_START": "token.is_sent_start",
+    "SENT_START": "token.is_sent_start",
+}
+
+def pattern_token_attributes():
+    """
+    Collect every token attribute used by the active PRODUCT/EVENT patterns
+    """
+    attributes = {"LOWER"} | set(TAIL_CHECKS)
+    for patterns in RESIDUAL_PATTERNS.values():
+        for pattern in patterns:
+            for token_spec in pattern:
+                attributes.update(key for key in token_spec if key != "OP")
+    return attributes
+
+def _load_model_config(model_name):
+    """Read a model's config.cfg without loading any weights"""
+    model_path = Path(model_name)
+    if not model_path.exists():
+        model_path = spacy.util.get_package_path(model_name)
+        # Installed packages keep the data in a versioned subdirectory
+        if not (model_path / "config.cfg").exists():
+            model_path = next(model_path.glob("*/config.cfg")).parent
+    return spacy.util.load_config(model_path / "config.cfg")
+
+def _listener_upstreams(model_config):
+    """Find the tok2vec components a model config listens to"""
+    upstreams = set()
+    if isinstance(model_config, dict):
+        if str(model_config.get("@architectures", "")).startswith("spacy.Tok2VecListener"):
+            upstreams.add(model_config.get("upstream", "*"))
+        for value in model_config.values():
+            upstreams |= _listener_upstreams(value)
+    return upstreams
+
+def entities_only_exclude(model_name="en_core_web_sm"):
+    """
+    Work out which components can be excluded when we only need doc.ents
+    Keeps the components that assign doc.ents or anything the patterns check
+    (e.g. ENT_TYPE), plus the shared tok2vec layers those components listen to.
+    """
+    if populate_registry is not None:
+        populate_registry()
+    
+    config = _load_model_config(model_name)
+    pipeline = list(config["nlp"]["pipeline"])
+    components = config["components"]
+    
+    needed = {"doc.ents"}
+    needed.update(ATTRIBUTE_REQUIREMENTS[attr] for attr in pattern_token_attributes()
+                  if attr in ATTRIBUTE_REQUIREMENTS)
+    
+    def assigns_and_requires(name):
+        factory = components[name].get("factory")
+        if factory is None or not Language.has_factory(factory):
+            return None
+        meta = Language.get_factory_meta(factory)
+        return set(meta.assigns), set(meta.requires)
+    
+    # Walk backwards so each component's requirements are known before earlier ones
+    required = set()
+    for name in reversed(pipeline):
+        info = assigns_and_requires(name)
+        if info is None:
+            # Unknown factory: keep it rather than risk breaking the pipeline
+            required.add(name)
+            continue
+        assigns, requires = info
+        if assigns & needed:
+            required.add(name)
+            needed |= requires
+    
+    # Listening components need their upstream tok2vec
+    for name in list(required):
+        for upstream in _listener_upstreams(components[name].get("model", {})):
+            if upstream == "*":
+                required.update(pipe for pipe in pipeline
+                                if components[pipe].get("factory") in ("tok2vec", "transformer"))
+            else:
+                required.add(upstream)
+    
+    return [name for name in pipeline if name not in required]
+
+class PipelineRegistry:
+    """
+    Thread-safe cache of loaded pipelines with the PRODUCT/EVENT component added
+    Keyed by (model name, pattern set version, entities-only mode) so each model is loaded only once!
+    """
+    
+    def __init__(self, max_models=2):
+        """Keep at most max_models pipelines, evicting the least recently used"""
+        self.max_models = max_models
+        self._pipelines = OrderedDict()
+        self._lock = threading.Lock()
+        # One lock per key being loaded, so a slow load never blocks other models
+        self._loading = {}
+    
+    def get(self, model_name="en_core_web_sm", gazetteer_path=None, entities_only=False):
+        """
+        Return the pipeline for a model, loading it on first use
+        With entities_only=True, components not needed for doc.ents are never loaded.
+        """
+        key = (model_name, gazetteer_fingerprint(gazetteer_path), entities_only)
+        with self._lock:
+            if key in self._pipelines:
+                self._pipelines.move_to_end(key)
+                return self._pipelines[key]
+            key_lock = self._loading.setdefault(key, threading.Lock())
         
-        if not overlaps:
-            new_ents.append((start, end, label))
+        # Concurrent callers for the same key wait here instead of loading it twice,
+        # while the registry lock stays free for hits and other keys
+        with key_lock:
+            with self._lock:
+                if key in self._pipelines:
+                    self._pipelines.move_to_end(key)
+                    return self._pipelines[key]
+            
+            exclude = entities_only_exclude(model_name) if entities_only else []
+            nlp = spacy.load(model_name, exclude=exclude)
+            add_product_event_component(nlp, gazetteer_path)
+            # Hash the weights now, so result cache lookups never pay for it
+            pipeline_content_hash(nlp)
+            
+            with self._lock:
+                self._pipelines[key] = nlp
+                self._loading.pop(key, None)
+                while len(self._pipelines) > self.max_models:
+                    self._pipelines.popitem(last=False)
+            
+            return nlp
     
-    # Combine existing and new entities
-    all_ents = existing_ents + new_ents
-    all_ents = sorted(set(all_ents))  # Remove duplicates and sort
+    def warm_up(self, model_names=("en_core_web_sm",), gazetteer_path=None, entities_only=False):
+        """
+        Load pipelines ahead of time so the first request doesn't pay for it
+        Pass the same gazetteer_path and entities_only the requests will use,
+        since each combination is cached separately.
+        """
+        for model_name in model_names:
+            self.get(model_name, gazetteer_path, entities_only)("warm up")
     
-    # Create new entity spans
-    entities = []
-    for start, end, label in all_ents:
-        entities.append(Span(doc, start, end, label=label))
+    def clear(self):
+        """Drop all cached pipelines"""
+        with self._lock:
+            self._pipelines.clear()
     
-    # Update document entities
-    doc.ents = entities
-    return doc
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._pipelines
+    
+    def __len__(self):
+        with self._lock:
+            return len(self._pipelines)
 
-def extract_entities_enhanced(text):
+# Shared registry used by extract_entities_enhanced
+pipeline_registry = PipelineRegistry()
+
+def get_pipeline(model_name="en_core_web_sm", gazetteer_path=None, entities_only=False):
+    """
+    Get the cached pipeline (with PRODUCT/EVENT recognition) for a model
+    """
+    return pipeline_registry.get(model_name, gazetteer_path, entities_only)
+
+def extract_entities_enhanced(text, model_name="en_core_web_sm", gazetteer_path=None,
+                              entities_only=False, metrics=None, doc_id=None, cache=None):
     """
     Enhanced entity extraction with PRODUCT and EVENT recognition
+    Set entities_only=True to skip the tagger, parser, lemmatizer etc.
+    Pass a MetricsSink (see pipeline_metrics.py) as metrics to time every stage,
+    and a ResultCache (see result_cache.py) as cache to skip repeated texts.
     """
-    # Load spaCy model
-    nlp = spacy.load("en_core_web_sm")
+    # Reuse the cached model (loaded once per process)
+    with stage_timer(metrics, "model_load", doc_id):
+        nlp = get_pipeline(model_name, gazetteer_path, entities_only)
     
-    # Set up custom matcher
-    matcher = setup_custom_entity_matcher(nlp)
+    if cache is not None:
+        fingerprint = pipeline_fingerprint(nlp)
+        key = cache.make_key(text, fingerprint)
+        entities = cache.get(key)
+        if entities is not None:
+            return entities
     
-    # Process text
-    doc = nlp(text)
+    # Process text - custom entities are added inside the pipeline
+    if metrics is None:
+        doc = nlp(text)
+    else:
+        doc = run_pipeline_instrumented(nlp, text, metrics, doc_id)
     
-    # Add custom entities
-    doc = add_custom_entities(doc, matcher)
+    entities = doc_to_entities(doc)
+    if cache is not None:
+        cache.put(key, entities, fingerprint)
+    return entities
+
+def run_pipeline_instrumented(nlp, text, metrics, doc_id=None):
+    """
+    Run the pipeline one component at a time, timing each stage
+    The PRODUCT/EVENT component is split into "matcher" and "overlap_resolution".
+    """
+    with stage_timer(metrics, "tokenization", doc_id):
+        doc = nlp.make_doc(text)
     
-    # Extract all entities (built-in + custom)
-    entities = []
-    for ent in doc.ents:
-        # Get description for custom entities
-        if ent.label_ in ["PRODUCT", "EVENT"]:
-            description = f"Custom {ent.label_.lower()} recognition"
+    for name, proc in nlp.pipeline:
+        if isinstance(proc, ProductEventRecognizer):
+            with stage_timer(metrics, "matcher", doc_id):
+                matches = proc.matcher(doc)
+            with stage_timer(metrics, "overlap_resolution", doc_id):
+                doc = resolve_custom_matches(doc, matches)
+            metrics.increment("custom_matches", len(matches), doc_id)
         else:
-            description = spacy.explain(ent.label_)
-            
-        entities.append({
-            'text': ent.text,
-            'label': ent.label_,
-            'description': description,
-            'is_custom': ent.label_ in ["PRODUCT", "EVENT"]
-        })
+            with stage_timer(metrics, name, doc_id):
+                doc = proc(doc)
     
-    return entities
+    metrics.increment("documents", 1, doc_id)
+    metrics.increment("characters", len(text), doc_id)
+    metrics.increment("tokens", len(doc), doc_id)
+    metrics.increment("entities", len(doc.ents), doc_id)
+    return doc
+
+def _read_texts(texts_or_paths):
+    """
+    Lazily turn a mix of texts and Path objects into texts
+    Files are read one at a time so memory stays bounded
+    """
+    for item in texts_or_paths:
+        if isinstance(item, Path):
+            with open(item, 'r', encoding='utf-8') as file:
+                yield file.read()
+        else:
+            yield item
+
+def extract_entities_batch(texts_or_paths, batch_size=64, n_process=1,
+                           model_name="en_core_web_sm", gazetteer_path=None,
+                           entities_only=False, cache=None, docbin_writer=None):
+    """
+    Batched, streaming version of extract_entities_enhanced built on nlp.pipe
+    Yields one entity list per input, in input order.
+    Plain strings are treated as text, pathlib.Path objects as files to read.
+    With a ResultCache, only texts that miss the cache go through the pipeline.
+    With a DocBinWriter (see docbin_store.py), every Doc is also saved. Saving needs
+    the Doc itself, so the cache is then only filled, never read.
+    """
+    nlp = get_pipeline(model_name, gazetteer_path, entities_only)
+    
+    if cache is None:
+        docs = nlp.pipe(_read_texts(texts_or_paths), batch_size=batch_size, n_process=n_process)
+        for doc in docs:
+            if docbin_writer is not None:
+                docbin_writer.add(doc)
+            yield doc_to_entities(doc)
+        return
+    
+    fingerprint = pipeline_fingerprint(nlp)
+    # One slot per input, in order: ("hit", entities), ("miss", key) or ("flush", None)
+    pending = deque()
+    
+    def misses():
+        waiting_hits = 0
+        for text in _read_texts(texts_or_paths):
+            key = cache.make_key(text, fingerprint)
+            entities = cache.get(key) if docbin_writer is None else None
+            if entities is None:
+                pending.append(("miss", key))
+                waiting_hits = 0
+                yield text
+            else:
+                pending.append(("hit", entities))
+                waiting_hits += 1
+                # A long run of hits would pile up here until the next miss;
+                # an empty placeholder doc forces nlp.pipe to hand results back
+                if waiting_hits >= batch_size:
+                    pending.append(("flush", None))
+                    waiting_hits = 0
+                    yield ""
+    
+    for doc in nlp.pipe(misses(), batch_size=batch_size, n_process=n_process):
+        while pending[0][0] == "hit":
+            yield pending.popleft()[1]
+        kind, key = pending.popleft()
+        if kind == "miss":
+            if docbin_writer is not None:
+                docbin_writer.add(doc)
+            entities = doc_to_entities(doc)
+            cache.put(key, entities, fingerprint)
+            yield entities
+    
+    while pending:
+        yield pending.popleft()[1]
+    cache.flush()
+
+CUSTOM_LABELS = ("PRODUCT", "EVENT")
+
+def describe_label(label):
+    """Human-readable description for a label (custom or built-in)"""
+    if label in CUSTOM_LABELS:
+        return f"Custom {label.lower()} recognition"
+    return spacy.explain(label)
+
+@dataclass
+class EntityResult:
+    """
+    Compact, column-oriented entities for one document
+    Offsets are character offsets into the original text.
+    """
+    __slots__ = ("texts", "labels", "starts", "ends")
+    texts: list
+    labels: list
+    starts: array
+    ends: array
+    
+    def __len__(self):
+        return len(self.labels)
+    
+    @property
+    def custom_count(self):
+        return sum(1 for label in self.labels if label in CUSTOM_LABELS)
+    
+    def to_dicts(self):
+        """The entity dicts returned by extract_entities_enhanced"""
+        return [{
+            'text': text,
+            'label': label,
+            'description': describe_label(label),
+            'is_custom': label in CUSTOM_LABELS
+        } for text, label in zip(self.texts, self.labels)]
+    
+    def organize(self):
+        """Label -> {entity text: count}, same shape as organize_entities_enhanced"""
+        organized = {}
+        for text, label in zip(self.texts, self.labels):
+            counts = organized.setdefault(label, {})
+            counts[text] = counts.get(text, 0) + 1
+        return organized
+
+@dataclass
+class ArticleResult:
+    """
+    Result of analyzing one article - no printing involved
+    """
+    __slots__ = ("source", "word_count", "sentence_count", "entities")
+    source: str
+    word_count: int
+    sentence_count: int
+    entities: EntityResult
+    
+    @property
+    def custom_count(self):
+        return self.entities.custom_count
+    
+    @property
+    def standard_count(self):
+        return len(self.entities) - self.entities.custom_count
+    
+    def organized(self):
+        return self.entities.organize()
+
+def doc_to_result(doc):
+    """
+    Convert a processed Doc into a compact EntityResult
+    """
+    ents = doc.ents
+    return EntityResult(
+        texts=[ent.text for ent in ents],
+        labels=[ent.label_ for ent in ents],
+        starts=array("l", [ent.start_char for ent in ents]),
+        ends=array("l", [ent.end_char for ent in ents]),
+    )
+
+def doc_to_entities(doc):
+    """
+    Convert a processed Doc into the entity dicts used throughout this module
+    """
+    return doc_to_result(doc).to_dicts()
+
+def analyze_text(text, source="", model_name="en_core_web_sm", gazetteer_path=None,
+                 entities_only=False, metrics=None, docbin_writer=None):
+    """
+    Analyze one article's text and return an ArticleResult
+    Pass a DocBinWriter to also keep the processed Doc for later re-analysis.
+    """
+    with stage_timer(metrics, "model_load", source):
+        nlp = get_pipeline(model_name, gazetteer_path, entities_only)
+    
+    if metrics is None:
+        doc = nlp(text)
+    else:
+        doc = run_pipeline_instrumented(nlp, text, metrics, source)
+    
+    if docbin_writer is not None:
+        docbin_writer.add(doc)
+    
+    entities = doc_to_result(doc)
+    if metrics is not None:
+        metrics.increment("custom_entities", entities.custom_count, source)
+    
+    return ArticleResult(
+        source=source,
+        word_count=len(text.split()),
+        sentence_count=text.count('.') + 1,
+        entities=entities,
+    )
+
+def analyze_file(filename, metrics=None, **kwargs):
+    """
+    Read an article from disk and analyze it
+    Raises FileNotFoundError if the file doesn't exist.
+    """
+    with stage_timer(metrics, "file_read", str(filename)):
+        with open(filename, 'r', encoding='utf-8') as file:
+            article_text = file.read()
+    return analyze_text(article_text, source=str(filename), metrics=metrics, **kwargs)
 
 def organize_entities_enhanced(entities):
     """
@@ -160,115 +723,122 @@ def organize_entities_enhanced(entities):
     
     return organized
 
-def display_results_enhanced(organized_entities, filename=""):
+def format_results_enhanced(organized_entities, filename=""):
     """
-    Enhanced display with special highlighting for custom entities
+    Render organized entities as text, with special highlighting for custom entities
     """
-    print("\n" + "="*70)
-    print(f"📰 ENHANCED NEWS ARTICLE ENTITY ANALYSIS")
+    lines = ["\n" + "="*70, f"📰 ENHANCED NEWS ARTICLE ENTITY ANALYSIS"]
     if filename:
-        print(f"Article: {filename}")
-    print("="*70)
+        lines.append(f"Article: {filename}")
+    lines.append("="*70)
     
     # Separate custom and standard entities for better display
     standard_entities = {}
     custom_entities = {}
     
     for label, entities in organized_entities.items():
-        if label in ["PRODUCT", "EVENT"]:
+        if label in CUSTOM_LABELS:
             custom_entities[label] = entities
         else:
             standard_entities[label] = entities
     
     # Display standard entities first
     if standard_entities:
-        print("\n🔍 STANDARD ENTITIES:")
-        print("-" * 50)
+        lines.append("\n🔍 STANDARD ENTITIES:")
+        lines.append("-" * 50)
         for label in sorted(standard_entities.keys()):
             entities = standard_entities[label]
             description = spacy.explain(label)
             
-            print(f"\n🏷️  {label} ({description}):")
+            lines.append(f"\n🏷️  {label} ({description}):")
             sorted_entities = sorted(entities.items(), key=lambda x: x[1], reverse=True)
             
             for entity, count in sorted_entities:
                 if count == 1:
-                    print(f"   • {entity}")
+                    lines.append(f"   • {entity}")
                 else:
-                    print(f"   • {entity} (mentioned {count} times)")
+                    lines.append(f"   • {entity} (mentioned {count} times)")
     
     # Display custom entities with special formatting
     if custom_entities:
-        print(f"\n✨ CUSTOM ENTITIES (Enhanced Recognition):")
-        print("-" * 50)
+        lines.append(f"\n✨ CUSTOM ENTITIES (Enhanced Recognition):")
+        lines.append("-" * 50)
         
-        for label in ["PRODUCT", "EVENT"]:  # Specific order
+        for label in CUSTOM_LABELS:  # Specific order
             if label in custom_entities:
                 entities = custom_entities[label]
                 emoji = "📱" if label == "PRODUCT" else "🎪"
                 
-                print(f"\n{emoji} {label}S:")
+                lines.append(f"\n{emoji} {label}S:")
                 sorted_entities = sorted(entities.items(), key=lambda x: x[1], reverse=True)
                 
                 for entity, count in sorted_entities:
                     if count == 1:
-                        print(f"   ⭐ {entity}")
+                        lines.append(f"   ⭐ {entity}")
                     else:
-                        print(f"   ⭐ {entity} (mentioned {count} times)")
+                        lines.append(f"   ⭐ {entity} (mentioned {count} times)")
+    
+    return "\n".join(lines)
 
-def analyze_article_enhanced(filename):
+def display_results_enhanced(organized_entities, filename=""):
+    """
+    Enhanced display with special highlighting for custom entities
+    """
+    print(format_results_enhanced(organized_entities, filename))
+
+def format_article_report(result, organized=None):
+    """
+    Render a full ArticleResult report (statistics, entities and summary) as text
+    Pass organized if result.organized() has already been computed.
+    """
+    if organized is None:
+        organized = result.organized()
+    total_mentions = sum(sum(ents.values()) for ents in organized.values())
+    
+    lines = [
+        f"\n📊 Article Statistics:",
+        f"   • Word count: {result.word_count}",
+        f"   • Sentence count: {result.sentence_count}",
+        f"\n🤖 Extracted entities (including PRODUCTS and EVENTS):",
+        f"   • Found {len(result.entities)} total entities",
+        f"   • Standard entities: {result.standard_count}",
+        f"   • Custom entities (PRODUCT/EVENT): {result.custom_count}",
+        format_results_enhanced(organized, result.source),
+        f"\n📈 SUMMARY STATISTICS:",
+        f"   • Total entity mentions: {total_mentions}",
+        f"   • Unique entities found: {len(result.entities)}",
+        f"   • Entity types found: {len(organized)}",
+    ]
+    if result.custom_count > 0:
+        lines.append(f"   ⭐ Custom entities detected: {result.custom_count}")
+    return "\n".join(lines)
+
+def analyze_article_enhanced(filename, metrics=None, docbin_writer=None):
     """
     Complete enhanced article analysis with PRODUCT and EVENT recognition
+    Prints a report; use analyze_file for the same analysis without any printing.
+    Pass a MetricsSink as metrics to record per-stage timings for this article,
+    and a DocBinWriter to save the processed Doc.
     """
     print(f"\n🔍 Enhanced Analysis: {filename}")
     print("="*80)
     
-    # Read the article
     try:
-        with open(filename, 'r', encoding='utf-8') as file:
-            article_text = file.read()
-        print(f"✅ Successfully loaded article from {filename}")
+        result = analyze_file(filename, metrics=metrics, docbin_writer=docbin_writer)
     except FileNotFoundError:
         print(f"❌ File '{filename}' not found!")
         return None
+    print(f"✅ Successfully loaded article from {filename}")
     
-    # Basic statistics
-    words = article_text.split()
-    sentences = article_text.split('.')
-    print(f"\n📊 Article Statistics:")
-    print(f"   • Word count: {len(words)}")
-    print(f"   • Sentence count: {len(sentences)}")
-    
-    # Enhanced entity extraction
-    print(f"\n🤖 Extracting entities (including PRODUCTS and EVENTS)...")
-    entities = extract_entities_enhanced(article_text)
-    
-    # Count custom vs standard entities
-    custom_count = len([e for e in entities if e.get('is_custom', False)])
-    standard_count = len(entities) - custom_count
+    with stage_timer(metrics, "organize", str(filename)):
+        organized = result.organized()
     
-    print(f"   • Found {len(entities)} total entities")
-    print(f"   • Standard entities: {standard_count}")
-    print(f"   • Custom entities (PRODUCT/EVENT): {custom_count}")
-    
-    # Organize and display
-    organized = organize_entities_enhanced(entities)
-    display_results_enhanced(organized, filename)
-    
-    # Summary
-    total_mentions = sum(sum(ents.values()) for ents in organized.values())
-    entity_types = len(organized)
-    
-    print(f"\n📈 SUMMARY STATISTICS:")
-    print(f"   • Total entity mentions: {total_mentions}")
-    print(f"   • Unique entities found: {len(entities)}")
-    print(f"   • Entity types found: {entity_types}")
-    if custom_count > 0:
-        print(f"   ⭐ Custom entities detected: {custom_count}")
+    with stage_timer(metrics, "display", str(filename)):
+        print(format_article_report(result, organized))
     
     return organized
 
-# Test with sample article containing products and events
+# Test article containing products and events
 test_article_enhanced = """
 Apple announced the new iPhone 15 Pro at their September event yesterday. 
 CEO Tim Cook revealed that the iPhone 15 will feature a titanium design and 
@@ -285,18 +855,24 @@ Tesla's Model S Plaid was chosen as the official vehicle for the Olympic Games
 torch relay in Paris.
 """
 
-# Save test article
-with open("enhanced_test_article.txt", "w") as f:
-    f.write(test_article_enhanced)
-
-# Run enhanced analysis
-print("🚀 TESTING ENHANCED ENTITY EXTRACTOR")
-print("="*80)
-
-result = analyze_article_enhanced("enhanced_test_article.txt")
+def run_demo():
+    """
+    Save the test article and run the enhanced analysis on it
+    """
+    with open("enhanced_test_article.txt", "w") as f:
+        f.write(test_article_enhanced)
+    
+    print("🚀 TESTING ENHANCED ENTITY EXTRACTOR")
+    print("="*80)
+    
+    result = analyze_article_enhanced("enhanced_test_article.txt")
+    
+    print("\n" + "🎉"*30)
+    print("SUCCESS! Your enhanced extractor can now recognize:")
+    print("• PRODUCTS: iPhone 15, Xbox Series X, Windows 11, Model S")  
+    print("• EVENTS: WWDC, CES 2024, Super Bowl, Grammy Awards, Olympic Games")
+    print("🎉"*30)
+    return result
 
-print("\n" + "🎉"*30)
-print("SUCCESS! Your enhanced extractor can now recognize:")
-print("• PRODUCTS: iPhone 15, Xbox Series X, Windows 11, Model S")  
-print("• EVENTS: WWDC, CES 2024, Super Bowl, Grammy Awards, Olympic Games")
-print("🎉"*30)
\ No newline at end of file
+if __name__ == "__main__":
+    run_demo()
@@ -0,0 +1,184 @@
+import json
+import os
+from collections import Counter
+from pathlib import Path
+
+class EntityAggregate:
+    """
+    Running entity frequency counts that can be merged and checkpointed
+    Each worker or shard builds its own aggregate, then they are merged together.
+    Document ids are remembered so a resumed run skips documents it already counted.
+    """
+
+    def __init__(self):
+        self.counts = {}  # label -> Counter of entity texts
+        self.processed = set()
+        # Ids added since the last checkpoint, and where that checkpoint's id log ends
+        self._unsaved_ids = []
+        self._checkpoint_path = None
+        self._ids_generation = None
+        self._ids_bytes = 0
+
+    def __len__(self):
+        """Number of documents counted so far"""
+        return len(self.processed)
+
+    def is_processed(self, doc_id):
+        return doc_id in self.processed
+
+    def add(self, pairs, doc_id=None):
+        """
+        Count (text, label) pairs for one document
+        Returns False (and counts nothing) if doc_id was already processed.
+        """
+        if doc_id is not None:
+            if doc_id in self.processed:
+                return False
+            self.processed.add(doc_id)
+            self._unsaved_ids.append(doc_id)
+
+        for text, label in pairs:
+            counter = self.counts.get(label)
+            if counter is None:
+                counter = self.counts[label] = Counter()
+            counter[text] += 1
+        return True
+
+    def add_entities(self, entities, doc_id=None):
+        """Count the entity dicts returned by extract_entities_enhanced"""
+        return self.add(((entity['text'], entity['label']) for entity in entities), doc_id)
+
+    def add_result(self, result, doc_id=None):
+        """Count an EntityResult (or ArticleResult) from the enhanced extractor"""
+        entities = getattr(result, "entities", result)
+        if doc_id is None:
+            doc_id = getattr(result, "source", None) or None
+        return self.add(zip(entities.texts, entities.labels), doc_id)
+
+    def merge(self, other):
+        """
+        Fold another aggregate into this one
+        Merging a shard whose documents were all counted already is a no-op,
+        so re-merging the same shard is harmless. A partial overlap raises
+        ValueError because the shared documents can't be separated out again.
+        """
+        if other.processed and other.processed <= self.processed:
+            return self
+        overlap = other.processed & self.processed
+        if overlap:
+            raise ValueError(f"Cannot merge aggregates that both counted {len(overlap)} "
+                             f"of the same documents (e.g. {next(iter(overlap))!r})")
+
+        for label, counter in other.counts.items():
+            self.counts.setdefault(label, Counter()).update(counter)
+        self.processed |= other.processed
+        self._unsaved_ids.extend(other.processed)
+        return self
+
+    def to_organized(self):
+        """Label -> {entity text: count}, the same shape as organize_entities_enhanced"""
+        return {label: dict(counter) for label, counter in self.counts.items()}
+
+    def most_common(self, label, n=10):
+        return self.counts.get(label, Counter()).most_common(n)
+
+    def save_checkpoint(self, path):
+        """
+        Write the aggregate to disk without ever leaving half a checkpoint
+        Processed ids go to an append-only log next to it (path + ".ids.<generation>",
+        one JSON value per line), so each save only writes the ids added since the
+        last one. The counts file is replaced atomically afterwards and records which
+        log and how many bytes of it belong to it; anything a crash left past that
+        point is ignored. The first save to a path starts a new generation instead of
+        rewriting the log the current counts file still points to.
+        """
+        path = Path(path)
+        if path == self._checkpoint_path:
+            generation = self._ids_generation
+            new_ids = self._unsaved_ids
+            ids_bytes = self._ids_bytes
+        else:
+            generation = _ids_generation(path) + 1
+            new_ids = self.processed
+            ids_bytes = 0
+        ids_path = _ids_path(path, generation)
+        lines = "".join(json.dumps(doc_id) + "\n" for doc_id in new_ids).encode("utf-8")
+        with open(ids_path, "r+b" if ids_bytes else "wb") as f:
+            f.seek(ids_bytes)
+            f.write(lines)
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+        ids_bytes += len(lines)
+
+        data = {
+            "version": 2,
+            "counts": self.to_organized(),
+            "ids_generation": generation,
+            "ids_bytes": ids_bytes,
+        }
+        _write_atomic(path, json.dumps(data))
+
+        if path != self._checkpoint_path and generation > 0:
+            # Nothing points at the previous generation's log any more
+            _ids_path(path, generation - 1).unlink(missing_ok=True)
+        self._checkpoint_path = path
+        self._ids_generation = generation
+        self._ids_bytes = ids_bytes
+        self._unsaved_ids = []
+
+    @classmethod
+    def load_checkpoint(cls, path):
+        """Load a checkpoint written by save_checkpoint"""
+        path = Path(path)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        aggregate = cls()
+        aggregate.counts = {label: Counter(counts) for label, counts in data["counts"].items()}
+        if data["version"] == 1:
+            aggregate.processed = set(data["processed"])
+            return aggregate
+
+        generation, ids_bytes = data["ids_generation"], data["ids_bytes"]
+        with open(_ids_path(path, generation), "r+b") as f:
+            aggregate.processed = {json.loads(line) for line in f.read(ids_bytes).splitlines()}
+            # Drop ids appended by a save that crashed before its counts were written
+            f.truncate(ids_bytes)
+        aggregate._checkpoint_path = path
+        aggregate._ids_generation = generation
+        aggregate._ids_bytes = ids_bytes
+        return aggregate
+
+    @classmethod
+    def resume(cls, path):
+        """Load a checkpoint if it exists, otherwise start a fresh aggregate"""
+        if Path(path).exists():
+            return cls.load_checkpoint(path)
+        return cls()
+
+def _ids_path(path, generation):
+    return path.with_name(f"{path.name}.ids.{generation}")
+
+def _ids_generation(path):
+    """Generation of the id log an existing checkpoint at path uses, or -1"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("ids_generation", -1)
+    except FileNotFoundError:
+        return -1
+
+def _write_atomic(path, text):
+    """Write text to a temporary file and move it into place"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def merge_checkpoints(paths):
+    """
+    Combine checkpoints written by parallel shards into one aggregate
+    """
+    merged = EntityAggregate()
+    for path in paths:
+        merged.merge(EntityAggregate.load_checkpoint(path))
+    return merged
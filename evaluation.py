@@ -0,0 +1,98 @@
+import time
+from collections import defaultdict, deque
+
+from spacy.scorer import PRFScore
+from spacy.training import Example
+
+from training_corpus import iter_reference_docs
+
+def count_entities(example, score_per_type):
+    """
+    Add one Example's entity true/false positives and false negatives to
+    score_per_type (label -> PRFScore), counted the same way as spacy.scorer.get_ner_prf
+    """
+    if not example.y.has_annotation("ENT_IOB"):
+        return
+    golds = {(ent.label_, ent.start, ent.end) for ent in example.y.ents}
+    align_x2y = example.alignment.x2y
+    for pred_ent in example.x.ents:
+        score = score_per_type[pred_ent.label_]
+        indices = align_x2y[pred_ent.start:pred_ent.end]
+        if len(indices):
+            gold_span = example.y[indices[0]:indices[-1] + 1]
+            # A prediction over missing annotation is neither right nor wrong
+            if all(token.ent_iob != 0 for token in gold_span):
+                key = (pred_ent.label_, indices[0], indices[-1] + 1)
+                if key in golds:
+                    score.tp += 1
+                    golds.remove(key)
+                else:
+                    score.fp += 1
+    for label, _, _ in golds:
+        score_per_type[label].fn += 1
+
+def evaluate(nlp, dataset, batch_size=256, n_process=1):
+    """
+    Score the pipeline's entities against gold annotations
+    dataset is anything load_examples accepts: a .spacy corpus, a training JSON
+    file, (text, annotations) pairs or Examples. Texts are streamed through
+    nlp.pipe in batches (n_process > 1 uses worker processes) and each prediction
+    is scored as it arrives, so only the Docs in flight are held in memory.
+    Only the nlp.pipe part is timed.
+    Returns overall and per-label precision/recall/F1 plus docs/sec.
+    """
+    references = deque()
+    score_per_type = defaultdict(PRFScore)
+    overhead = 0.0
+
+    def texts():
+        # Reading the gold Docs isn't part of the pipeline, so it's left out of the timing
+        nonlocal overhead
+        reading = time.perf_counter()
+        for reference in iter_reference_docs(nlp, dataset):
+            references.append(reference)
+            overhead += time.perf_counter() - reading
+            yield reference.text
+            reading = time.perf_counter()
+        overhead += time.perf_counter() - reading
+
+    docs = 0
+    start = time.perf_counter()
+    for doc in nlp.pipe(texts(), batch_size=batch_size, n_process=n_process):
+        scoring = time.perf_counter()
+        count_entities(Example(doc, references.popleft()), score_per_type)
+        docs += 1
+        overhead += time.perf_counter() - scoring
+    seconds = time.perf_counter() - start - overhead
+
+    totals = PRFScore()
+    for score in score_per_type.values():
+        totals += score
+    scored = len(totals) > 0
+    return {
+        "docs": docs,
+        "seconds": seconds,
+        "docs_per_sec": docs / seconds if seconds else 0.0,
+        "precision": totals.precision if scored else None,
+        "recall": totals.recall if scored else None,
+        "f1": totals.fscore if scored else None,
+        "per_label": {label: {"precision": score.precision, "recall": score.recall,
+                              "f1": score.fscore}
+                      for label, score in sorted(score_per_type.items())},
+    }
+
+def report_evaluation(nlp, dataset, batch_size=256, n_process=1):
+    """Run evaluate() and print its table; returns the scores"""
+    scores = evaluate(nlp, dataset, batch_size=batch_size, n_process=n_process)
+    print(format_evaluation(scores))
+    return scores
+
+def format_evaluation(scores):
+    """Format the result of evaluate() as a text table"""
+    lines = [f"{'LABEL':<16}{'P':>8}{'R':>8}{'F1':>8}", "-" * 40]
+    for label, prf in scores["per_label"].items():
+        lines.append(f"{label:<16}{prf['precision']:>8.3f}{prf['recall']:>8.3f}{prf['f1']:>8.3f}")
+    lines.append("-" * 40)
+    lines.append(f"{'ALL':<16}{scores['precision'] or 0:>8.3f}{scores['recall'] or 0:>8.3f}{scores['f1'] or 0:>8.3f}")
+    lines.append(f"{scores['docs']} docs in {scores['seconds']:.2f}s ({scores['docs_per_sec']:.1f} docs/sec)")
+    return "\n".join(lines)
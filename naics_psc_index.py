@@ -0,0 +1,204 @@
+import bisect
+import csv
+import mmap
+import shutil
+import struct
+from collections.abc import Mapping
+from pathlib import Path
+
+# File layout (all integers little-endian uint32):
+#   header   MAGIC, count, key_width
+#   keys     count fixed-width ASCII codes, sorted, NUL padded
+#   offsets  count + 1 positions into the descriptions blob
+#   blob     UTF-8 descriptions, back to back
+MAGIC = b"NPSCIDX1"
+HEADER = struct.Struct("<8sII")
+OFFSET = struct.Struct("<I")
+
+class _SortedKeys:
+    """Sequence view over the key table so bisect can search the mapped file directly"""
+
+    def __init__(self, index):
+        self.index = index
+
+    def __len__(self):
+        return self.index.count
+
+    def __getitem__(self, position):
+        return self.index._key_bytes(position)
+
+class CodeIndex(Mapping):
+    """
+    Read-only code -> description table backed by a memory-mapped index file
+    Opening only maps the file, so it takes milliseconds whatever the table size,
+    and every process that opens the same file shares its pages through the OS
+    cache. Behaves like the plain dicts from create_naics_psc_database.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.count, self.key_width = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a NAICS/PSC index file")
+        self._keys_start = HEADER.size
+        self._offsets_start = self._keys_start + self.count * self.key_width
+        self._blob_start = self._offsets_start + (self.count + 1) * OFFSET.size
+        self._sorted_keys = _SortedKeys(self)
+
+    def __reduce__(self):
+        # Worker processes reopen the file instead of receiving a pickled copy
+        return (CodeIndex, (str(self.path),))
+
+    def _key_bytes(self, position):
+        start = self._keys_start + position * self.key_width
+        return self._map[start:start + self.key_width]
+
+    def _code(self, position):
+        return self._key_bytes(position).rstrip(b"\0").decode("ascii")
+
+    def _description(self, position):
+        start, = OFFSET.unpack_from(self._map, self._offsets_start + position * OFFSET.size)
+        end, = OFFSET.unpack_from(self._map, self._offsets_start + (position + 1) * OFFSET.size)
+        return self._map[self._blob_start + start:self._blob_start + end].decode("utf-8")
+
+    def _encode(self, code, fill=b"\0"):
+        key = code.encode("ascii")
+        if len(key) > self.key_width:
+            return None
+        return key.ljust(self.key_width, fill)
+
+    def _find(self, code):
+        try:
+            key = self._encode(str(code))
+        except UnicodeEncodeError:
+            return None
+        if key is None:
+            return None
+        position = bisect.bisect_left(self._sorted_keys, key)
+        if position < self.count and self._key_bytes(position) == key:
+            return position
+        return None
+
+    def __getitem__(self, code):
+        position = self._find(code)
+        if position is None:
+            raise KeyError(code)
+        return self._description(position)
+
+    def __contains__(self, code):
+        return self._find(code) is not None
+
+    def __iter__(self):
+        for position in range(self.count):
+            yield self._code(position)
+
+    def __len__(self):
+        return self.count
+
+    def _prefix_range(self, prefix):
+        try:
+            low = self._encode(str(prefix), b"\0")
+            high = self._encode(str(prefix), b"\xff")
+        except UnicodeEncodeError:
+            return range(0)  # codes are ASCII, so nothing can match
+        if low is None:
+            return range(0)
+        return range(bisect.bisect_left(self._sorted_keys, low),
+                     bisect.bisect_right(self._sorted_keys, high))
+
+    def prefix(self, prefix):
+        """All (code, description) pairs starting with prefix, e.g. "5415" -> 5415, 54151, 541511, ..."""
+        return [(self._code(position), self._description(position))
+                for position in self._prefix_range(prefix)]
+
+    def children(self, code):
+        """Codes exactly one level below code in the NAICS hierarchy"""
+        return [(child, description) for child, description in self.prefix(code)
+                if len(child) == len(code) + 1]
+
+    def ancestors(self, code):
+        """Listed parent codes from the 2-digit sector down, e.g. 541511 -> 54, 541, 5415, 54151"""
+        return [(code[:length], self[code[:length]])
+                for length in range(2, len(code)) if code[:length] in self]
+
+    def close(self):
+        self._map.close()
+
+def build_index(entries, path):
+    """
+    Write (code, description) pairs to an index file; duplicate codes keep the
+    first description. Returns the number of codes written.
+    """
+    table = {}
+    for code, description in entries:
+        code = str(code).strip()
+        if code and code not in table:
+            table[code] = (description or "").strip()
+
+    codes = sorted(table, key=lambda code: code.encode("ascii"))
+    key_width = max((len(code) for code in codes), default=1)
+
+    blob = bytearray()
+    offsets = [0]
+    for code in codes:
+        blob += table[code].encode("utf-8")
+        offsets.append(len(blob))
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(codes), key_width))
+        for code in codes:
+            f.write(code.encode("ascii").ljust(key_width, b"\0"))
+        f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        f.write(blob)
+    return len(codes)
+
+def _find_column(fieldnames, names):
+    for field in fieldnames:
+        if any(name in field.lower() for name in names):
+            return field
+    raise ValueError(f"No column like {names} in {fieldnames}")
+
+def build_index_from_csv(csv_path, path, code_column=None, description_column=None):
+    """
+    Build an index from an official code list exported to CSV
+    Without explicit column names, the first column mentioning "code" and the first
+    mentioning "title", "name" or "description" are used (this matches both the
+    Census NAICS and the GSA PSC downloads).
+    """
+    with open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        code_column = code_column or _find_column(reader.fieldnames, ("code",))
+        description_column = description_column or _find_column(
+            reader.fieldnames, ("title", "name", "description"))
+        return build_index(((row[code_column], row[description_column]) for row in reader), path)
+
+def save_code_tables(naics_codes, psc_codes, model_dir):
+    """
+    Metadata entries for a model's code tables: indexes are copied next to the
+    model and referenced by file name, plain dicts are stored inline
+    """
+    entries = {}
+    for name, table in (("naics", naics_codes), ("psc", psc_codes)):
+        if isinstance(table, CodeIndex):
+            target = Path(model_dir) / f"{name}.idx"
+            if table.path.resolve() != target.resolve():
+                shutil.copyfile(table.path, target)
+            entries[f"{name}_index"] = target.name
+        else:
+            entries[f"{name}_codes"] = dict(table)
+    return entries
+
+def load_code_tables(metadata, model_dir):
+    """Inverse of save_code_tables: (naics_codes, psc_codes) from model metadata"""
+    tables = []
+    for name in ("naics", "psc"):
+        if f"{name}_index" in metadata:
+            tables.append(CodeIndex(Path(model_dir) / metadata[f"{name}_index"]))
+        else:
+            tables.append(metadata.get(f"{name}_codes", {}))
+    return tuple(tables)
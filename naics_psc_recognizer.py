@@ -0,0 +1,269 @@
+import json
+import re
+from collections import namedtuple
+from pathlib import Path
+
+from spacy.language import Language
+from spacy.util import filter_spans
+
+from naics_psc_index import load_code_tables
+
+# A code found in text; ambiguous matches are left for the statistical ner to decide
+CodeMatch = namedtuple("CodeMatch", ["start", "end", "text", "label", "ambiguous"])
+
+NAICS_CUE = re.compile(r"\bNAICS\b", re.IGNORECASE)
+PSC_CUE = re.compile(r"\b(?:PSC|Product\s+Service\s+Codes?|Product\s+codes?)\b", re.IGNORECASE)
+
+NAICS_FORMAT = r"\d{6}"
+PSC_FORMAT = r"(?=[A-Z]*\d)[A-Z0-9]{4}"  # 4 alphanumerics with at least one digit
+
+# Text allowed between a cue and its code(s), e.g. "code: ", " and ", ", "
+CONNECTOR = re.compile(r"[\s:#,;()/&-]*(?:(?:codes?|numbers?|no\.|and|or)\b[\s:#,;()/&-]*)*",
+                       re.IGNORECASE)
+
+def trie_regex(words):
+    """
+    Compile a list of strings into a regex shaped like a trie (shared prefixes are
+    matched once), which stays fast with thousands of alternatives
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node):
+        branches = [re.escape(char) + build(child)
+                    for char, child in sorted(node.items()) if char != ""]
+        if not branches:
+            return ""
+        optional = "" in node
+        if len(branches) == 1 and not optional:
+            return branches[0]
+        pattern = "(?:" + "|".join(branches) + ")"
+        return pattern + "?" if optional else pattern
+
+    return build(trie)
+
+def load_code_tables_json(codes_path):
+    """
+    Read (naics_codes, psc_codes) from a saved model's metadata.json, or any JSON
+    file with "naics_codes"/"psc_codes" entries. Missing file -> empty tables.
+    """
+    if not codes_path or not Path(codes_path).exists():
+        return (), ()
+    with open(codes_path, "r") as f:
+        data = json.load(f)
+    return load_code_tables(data, Path(codes_path).parent)
+
+class CodeRecognizer:
+    """
+    Rule-based NAICS/PSC recognizer working directly on raw text
+    Known codes are found with one trie-shaped regex over the code tables; unknown
+    but well-formed codes are only accepted next to a context cue ("NAICS", "PSC",
+    "Product Service Code"). Anything unclear is flagged as ambiguous.
+    """
+
+    def __init__(self, naics_codes=(), psc_codes=(), context_window=40):
+        # Full tables list every NAICS level; only 6-digit codes appear in documents
+        self.naics_codes = {code for code in naics_codes if re.fullmatch(NAICS_FORMAT, code)}
+        self.psc_codes = set(psc_codes)
+        self.context_window = context_window
+
+        alternatives = []
+        known = sorted(self.naics_codes | self.psc_codes)
+        if known:
+            alternatives.append(f"(?P<known>{trie_regex(known)})")
+        alternatives.append(f"(?P<naics>{NAICS_FORMAT})")
+        alternatives.append(f"(?P<psc>{PSC_FORMAT})")
+        self.pattern = re.compile(r"(?<![A-Za-z0-9])(?:" + "|".join(alternatives) + r")(?![A-Za-z0-9])")
+
+    def find_codes(self, text):
+        """Return a CodeMatch for every candidate code in the text"""
+        cues = sorted([(match.end(), "NAICS") for match in NAICS_CUE.finditer(text)]
+                      + [(match.end(), "PSC") for match in PSC_CUE.finditer(text)])
+        cue_index = 0
+        # End offset and label of the latest cue, or of a code listed right after one
+        anchor = None
+
+        matches = []
+        for match in self.pattern.finditer(text):
+            code = match.group()
+            start, end = match.span()
+            while cue_index < len(cues) and cues[cue_index][0] <= start:
+                anchor = cues[cue_index]
+                cue_index += 1
+
+            cue = None
+            if anchor is not None:
+                gap = text[anchor[0]:start]
+                if len(gap) <= self.context_window and CONNECTOR.fullmatch(gap):
+                    cue = anchor[1]
+
+            if code in self.naics_codes:
+                found = CodeMatch(start, end, code, "NAICS", False)
+            elif code in self.psc_codes:
+                # A bare 4-digit number could just as well be a year or a quantity
+                found = CodeMatch(start, end, code, "PSC", code.isdigit() and cue is None)
+            elif cue is None:
+                continue
+            elif match.group("naics"):
+                found = CodeMatch(start, end, code, "NAICS", cue != "NAICS")
+            else:
+                found = CodeMatch(start, end, code, "PSC", cue != "PSC")
+
+            matches.append(found)
+            if cue is not None:
+                anchor = (end, cue)
+        return matches
+
+    def to_dict(self):
+        return {"naics_codes": sorted(self.naics_codes), "psc_codes": sorted(self.psc_codes),
+                "context_window": self.context_window}
+
+class CodeRecognizerComponent:
+    """
+    Pipeline component wrapping CodeRecognizer
+    Put it before "ner": confident codes become entities (which the ner then
+    respects), ambiguous candidates are stored in doc.spans["naics_psc_ambiguous"].
+    """
+
+    def __init__(self, name, naics_codes=(), psc_codes=(), context_window=40):
+        self.name = name
+        self.recognizer = CodeRecognizer(naics_codes, psc_codes, context_window)
+
+    def __call__(self, doc):
+        confident = []
+        ambiguous = []
+        for match in self.recognizer.find_codes(doc.text):
+            span = doc.char_span(match.start, match.end, label=match.label)
+            if span is None:
+                continue
+            (ambiguous if match.ambiguous else confident).append(span)
+
+        # Never overwrite entities set by earlier components
+        taken = {i for ent in doc.ents for i in range(ent.start, ent.end)}
+        confident = [span for span in filter_spans(confident)
+                     if not any(i in taken for i in range(span.start, span.end))]
+        if confident:
+            doc.set_ents(confident, default="unmodified")
+        doc.spans["naics_psc_ambiguous"] = ambiguous
+        return doc
+
+    def to_disk(self, path, exclude=tuple()):
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        with open(path / "codes.json", "w") as f:
+            json.dump(self.recognizer.to_dict(), f)
+
+    def from_disk(self, path, exclude=tuple()):
+        codes_file = Path(path) / "codes.json"
+        if codes_file.exists():
+            with open(codes_file, "r") as f:
+                data = json.load(f)
+            self.recognizer = CodeRecognizer(data["naics_codes"], data["psc_codes"],
+                                             data.get("context_window", 40))
+        return self
+
+@Language.factory(
+    "naics_psc_code_recognizer",
+    default_config={"codes_path": None, "context_window": 40},
+    assigns=["doc.ents", "token.ent_type", "token.ent_iob", "doc.spans"],
+)
+def create_code_recognizer(nlp, name, codes_path, context_window):
+    naics_codes, psc_codes = load_code_tables_json(codes_path)
+    return CodeRecognizerComponent(name, naics_codes, psc_codes, context_window)
+
+# Anchored format checks, compiled once
+VALIDATION_PATTERNS = {
+    "NAICS": re.compile(r"^\d{6}$"),  # Exactly 6 digits
+    "PSC": re.compile(r"^[A-Z0-9]{4}$"),  # 4 alphanumeric characters
+}
+
+class CodeValidator:
+    """
+    Precompiled NAICS/PSC validation
+    status() grades a code as:
+      "known"    - listed in the code tables
+      "related"  - a NAICS code whose sector/subsector prefix is in the tables
+      "format"   - well-formed, but not found in the tables
+      "invalid"  - doesn't have the NAICS/PSC format
+    Labels other than NAICS and PSC are always "known".
+    """
+
+    def __init__(self, naics_codes=(), psc_codes=()):
+        self.naics_codes = frozenset(naics_codes)
+        self.psc_codes = frozenset(psc_codes)
+        # NAICS is hierarchical: 54 -> 541 -> 5415 -> 54151 -> 541511
+        self.naics_prefixes = frozenset(code[:length] for code in self.naics_codes
+                                        for length in range(2, len(code)))
+
+    def is_valid_format(self, text, label):
+        pattern = VALIDATION_PATTERNS.get(label)
+        return pattern is None or pattern.match(text.strip()) is not None
+
+    def status(self, text, label):
+        if label not in VALIDATION_PATTERNS:
+            return "known"
+        code = text.strip()
+        if not VALIDATION_PATTERNS[label].match(code):
+            return "invalid"
+        if code in (self.naics_codes if label == "NAICS" else self.psc_codes):
+            return "known"
+        if label == "NAICS" and any(code[:length] in self.naics_prefixes for length in range(5, 1, -1)):
+            return "related"
+        return "format"
+
+    def validate(self, text, label):
+        """True when the code is well-formed for its label"""
+        return self.status(text, label) != "invalid"
+
+    def validate_spans(self, spans):
+        """Statuses for a batch of spans (e.g. doc.ents), in order"""
+        status = self.status
+        return [status(span.text, span.label_) for span in spans]
+
+class CodeValidatorComponent:
+    """
+    Pipeline component that checks NAICS/PSC entities after the ner
+    Malformed codes are collected in doc.spans["naics_psc_invalid"] and, with
+    drop_invalid, removed from doc.ents.
+    """
+
+    def __init__(self, name, naics_codes=(), psc_codes=(), drop_invalid=False):
+        self.name = name
+        self.drop_invalid = drop_invalid
+        self.validator = CodeValidator(naics_codes, psc_codes)
+
+    def __call__(self, doc):
+        ents = doc.ents
+        statuses = self.validator.validate_spans(ents)
+        invalid = [ent for ent, status in zip(ents, statuses) if status == "invalid"]
+        doc.spans["naics_psc_invalid"] = invalid
+        if invalid and self.drop_invalid:
+            doc.ents = [ent for ent, status in zip(ents, statuses) if status != "invalid"]
+        return doc
+
+    def to_disk(self, path, exclude=tuple()):
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        with open(path / "codes.json", "w") as f:
+            json.dump({"naics_codes": sorted(self.validator.naics_codes),
+                       "psc_codes": sorted(self.validator.psc_codes)}, f)
+
+    def from_disk(self, path, exclude=tuple()):
+        codes_file = Path(path) / "codes.json"
+        if codes_file.exists():
+            self.validator = CodeValidator(*load_code_tables_json(codes_file))
+        return self
+
+@Language.factory(
+    "naics_psc_code_validator",
+    default_config={"codes_path": None, "drop_invalid": False},
+    requires=["doc.ents"],
+    assigns=["doc.spans"],
+)
+def create_code_validator(nlp, name, codes_path, drop_invalid):
+    naics_codes, psc_codes = load_code_tables_json(codes_path)
+    return CodeValidatorComponent(name, naics_codes, psc_codes, drop_invalid)
@@ -2,9 +2,221 @@ import spacy
 from spacy.training import Example
 from spacy.util import minibatch
 import random
-import re
+import gc
 import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
+from string import Formatter
+
+from config_training import build_training_config, run_config_training, write_corpora
+from evaluation import report_evaluation
+from naics_psc_index import CodeIndex, load_code_tables, save_code_tables
+from naics_psc_recognizer import VALIDATION_PATTERNS, CodeRecognizer, CodeValidator
+
+class CompiledTemplate:
+    """
+    A format template split into literal text and fields, so entity offsets can be
+    computed from string lengths while rendering instead of searching the text
+    entity_fields maps field names to entity labels, e.g. {"code": "NAICS"}.
+    """
+    
+    def __init__(self, template, entity_fields):
+        self.template = template
+        self.parts = []
+        for literal, field, _, _ in Formatter().parse(template):
+            self.parts.append((literal, field, entity_fields.get(field)))
+    
+    def render(self, **values):
+        """Return (text, {"entities": [(start, end, label)]})"""
+        pieces = []
+        entities = []
+        position = 0
+        for literal, field, label in self.parts:
+            pieces.append(literal)
+            position += len(literal)
+            if field is None:
+                continue
+            value = str(values[field])
+            if label is not None:
+                entities.append((position, position + len(value), label))
+            pieces.append(value)
+            position += len(value)
+        return "".join(pieces), {"entities": entities}
+
+# NAICS Code Training Examples
+NAICS_TEMPLATES = [
+    "Company operates under NAICS code {code} for {description}",
+    "Primary business classification is NAICS {code} ({description})", 
+    "The contractor's NAICS code {code} indicates {description}",
+    "Vendor specializes in NAICS {code} - {description}",
+    "Business category NAICS {code}: {description}",
+    "Industry classification {code} covers {description}",
+    "NAICS {code} businesses provide {description}",
+    "The firm is registered under {code} for {description}",
+    "Small business set-aside for NAICS code {code}",
+    "Competition restricted to {code} classified businesses",
+    "Contractor must have experience in NAICS {code}",
+    "Primary NAICS: {code}",
+    "NAICS Code: {code}",
+    "{code} - {description}"
+]
+
+# PSC Code Training Examples
+PSC_TEMPLATES = [
+    "Product Service Code {code} covers {description}",
+    "PSC {code}: {description}",
+    "Government procurement under PSC {code} for {description}",
+    "Contract requires {code} certified vendors for {description}",
+    "Service category PSC {code} - {description}", 
+    "Federal acquisition of {code} services ({description})",
+    "PSC Code: {code}",
+    "Product code {code} encompasses {description}",
+    "Supplies under PSC {code} include {description}",
+    "Services classification {code} covers {description}",
+    "The RFP specifies PSC code {code}",
+    "Contract vehicle for {code} - {description}",
+    "SEWP contract covers PSC {code}",
+    "GSA Schedule for {code} services"
+]
+
+COMPILED_NAICS_TEMPLATES = [CompiledTemplate(t, {"code": "NAICS"}) for t in NAICS_TEMPLATES]
+COMPILED_PSC_TEMPLATES = [CompiledTemplate(t, {"code": "PSC"}) for t in PSC_TEMPLATES]
+
+# Mixed examples with both NAICS and PSC
+_MIXED_FIELDS = {"naics": "NAICS", "psc": "PSC", "psc2": "PSC"}
+MIXED_EXAMPLES = [
+    (CompiledTemplate("The contractor specializes in NAICS {naics} services and has experience with PSC {psc} requirements", _MIXED_FIELDS),
+     {"naics": "541511", "psc": "7030"}),
+    
+    (CompiledTemplate("Small business under NAICS code {naics} seeking PSC {psc} opportunities", _MIXED_FIELDS),
+     {"naics": "541512", "psc": "D302"}),
+    
+    (CompiledTemplate("RFP for PSC {psc} services, open to NAICS {naics} classified businesses", _MIXED_FIELDS),
+     {"naics": "541513", "psc": "7035"}),
+    
+    (CompiledTemplate("Contract combines NAICS {naics} data services with PSC {psc} engineering support", _MIXED_FIELDS),
+     {"naics": "518210", "psc": "R425"}),
+    
+    (CompiledTemplate("Vendor capabilities: NAICS {naics}, PSC codes {psc} and {psc2}", _MIXED_FIELDS),
+     {"naics": "334111", "psc": "7030", "psc2": "D307"}),
+]
+
+# Negative examples (text without codes) for better training
+NEGATIVE_EXAMPLES = [
+    "The company provides excellent software development services",
+    "Government contracting requires careful attention to regulations",
+    "Small business administration supports veteran-owned enterprises",
+    "Information technology solutions for federal agencies",
+    "Professional consulting services available nationwide",
+]
+
+def _buffered_shuffle(examples, buffer_size, rng=random):
+    """
+    Approximately shuffle a stream while holding at most buffer_size items in memory
+    """
+    buffer = []
+    for example in examples:
+        if len(buffer) < buffer_size:
+            buffer.append(example)
+            continue
+        index = rng.randrange(buffer_size)
+        yield buffer[index]
+        buffer[index] = example
+    rng.shuffle(buffer)
+    yield from buffer
+
+# Pipeline kept alive in each worker process between training rounds
+_worker_pipeline = None
+_worker_config = None
+# Training data callable of train_model_parallel, inherited by forked workers
+_worker_stream = None
+
+def _model_params(nlp):
+    """All trainable weights in the pipeline, keyed by (component, node index, name)"""
+    params = {}
+    for name, proc in nlp.pipeline:
+        model = getattr(proc, "model", None)
+        if model is None:
+            continue
+        for index, node in enumerate(model.walk()):
+            for param_name in node.param_names:
+                if node.has_param(param_name):
+                    params[(name, index, param_name)] = node.get_param(param_name)
+    return params
+
+def _set_model_params(nlp, params):
+    """Write weights produced by _model_params back into the pipeline"""
+    for name, proc in nlp.pipeline:
+        model = getattr(proc, "model", None)
+        if model is None:
+            continue
+        for index, node in enumerate(model.walk()):
+            for param_name in node.param_names:
+                key = (name, index, param_name)
+                if key in params:
+                    node.set_param(param_name, params[key])
+
+def _average_params(results):
+    """Average the weights from each worker, weighted by how many examples it saw"""
+    total = sum(count for _, _, count in results)
+    averaged = {}
+    for params, _, count in results:
+        for key, value in params.items():
+            weighted = value * (count / total)
+            averaged[key] = weighted if key not in averaged else averaged[key] + weighted
+    return averaged
+
+def _load_worker_pipeline(config_str, model_bytes):
+    """The worker's pipeline with the current round's weights"""
+    global _worker_pipeline, _worker_config
+    if _worker_pipeline is None or _worker_config != config_str:
+        config = spacy.util.load_config_from_str(config_str)
+        _worker_pipeline = spacy.util.load_model_from_config(config, auto_fill=False)
+        _worker_config = config_str
+    return _worker_pipeline.from_bytes(model_bytes)
+
+def _train_shard(config_str, model_bytes, shard, epochs, batch_size, seed):
+    """
+    Worker process: train a copy of the model on one shard of the examples
+    Returns (weights, losses, number of examples).
+    """
+    nlp = _load_worker_pipeline(config_str, model_bytes)
+    rng = random.Random(seed)
+    examples = [Example.from_dict(nlp.make_doc(text), annotations) for text, annotations in shard]
+    optimizer = nlp.resume_training()
+    losses = {}
+    for _ in range(epochs):
+        rng.shuffle(examples)
+        for batch in minibatch(examples, size=batch_size):
+            nlp.update(batch, sgd=optimizer, losses=losses)
+    
+    return _model_params(nlp), losses, len(examples)
+
+def _train_stream_slice(config_str, model_bytes, index, stride, epochs, batch_size,
+                        shuffle_buffer, seed):
+    """
+    Worker process: train a copy of the model on every stride-th example (starting
+    at index) of a fresh pass over the inherited training data callable, each epoch.
+    Only the shuffle buffer and one batch are held in memory.
+    Returns (weights, losses, number of examples per epoch).
+    """
+    nlp = _load_worker_pipeline(config_str, model_bytes)
+    rng = random.Random(seed)
+    optimizer = nlp.resume_training()
+    losses = {}
+    count = 0
+    for _ in range(epochs):
+        count = 0
+        stream = _buffered_shuffle(islice(_worker_stream(), index, None, stride), shuffle_buffer, rng)
+        for batch in minibatch(stream, size=batch_size):
+            examples = [Example.from_dict(nlp.make_doc(text), annotations) for text, annotations in batch]
+            nlp.update(examples, sgd=optimizer, losses=losses)
+            count += len(examples)
+    
+    return _model_params(nlp), losses, count
 
 class NAICSPSCTrainer:
     """
@@ -29,8 +241,58 @@ class NAICSPSCTrainer:
         self.ner.add_label("NAICS")
         self.ner.add_label("PSC")
         
+        self._reset_code_tables()
         print("✅ Blank model initialized with NAICS and PSC entity recognition")
     
+    @classmethod
+    def from_saved(cls, path="./naics_psc_model", exclude=()):
+        """
+        Load a saved model without building a blank pipeline first
+        The metadata and code tables are only read when first used, and exclude skips
+        components that aren't needed (e.g. "naics_psc_code_validator").
+        """
+        trainer = cls.__new__(cls)
+        trainer.nlp = spacy.load(path, exclude=exclude)
+        trainer.ner = trainer.nlp.get_pipe("ner") if "ner" in trainer.nlp.pipe_names else None
+        trainer._reset_code_tables(Path(path) / "metadata.json")
+        return trainer
+    
+    def _reset_code_tables(self, metadata_path=None):
+        self._metadata_path = metadata_path
+        self._metadata = None
+        self._naics_db = None
+        self._psc_db = None
+    
+    @property
+    def metadata(self):
+        """The saved model's metadata.json, parsed on first access (None if there is none)"""
+        if self._metadata is None and self._metadata_path is not None and self._metadata_path.exists():
+            with open(self._metadata_path, "r") as f:
+                self._metadata = json.load(f)
+        return self._metadata
+    
+    def _load_code_tables(self):
+        if self._naics_db is None and self.metadata is not None:
+            self._naics_db, self._psc_db = load_code_tables(self.metadata, self._metadata_path.parent)
+    
+    @property
+    def naics_db(self):
+        self._load_code_tables()
+        return self._naics_db
+    
+    @naics_db.setter
+    def naics_db(self, table):
+        self._naics_db = table
+    
+    @property
+    def psc_db(self):
+        self._load_code_tables()
+        return self._psc_db
+    
+    @psc_db.setter
+    def psc_db(self, table):
+        self._psc_db = table
+    
     def create_naics_psc_database(self):
         """
         Create reference database of real NAICS and PSC codes
@@ -88,125 +350,78 @@ class NAICSPSCTrainer:
         self.psc_db = psc_codes
         return naics_codes, psc_codes
     
-    def generate_training_data(self):
+    def use_code_index(self, naics_index_path, psc_index_path):
         """
-        Generate comprehensive training data for NAICS and PSC recognition
+        Switch to the complete official code tables stored as index files
+        (see naics_psc_index.build_index_from_csv). They are memory-mapped, so this is
+        fast and the tables are shared by every worker process instead of copied.
         """
-        print("📊 Generating training data for NAICS and PSC codes...")
+        self.naics_db = CodeIndex(naics_index_path)
+        self.psc_db = CodeIndex(psc_index_path)
+        return self.naics_db, self.psc_db
+    
+    def iter_training_data(self, seed=None, sample_rate=0.7, templates_per_code=8,
+                           naics_codes=None, psc_codes=None):
+        """
+        Lazily generate training examples for NAICS and PSC recognition
+        Entity offsets come from the compiled templates, so nothing is searched for in
+        the text. Pass a seed for reproducible output; pass full code tables as
+        naics_codes/psc_codes to stream millions of examples without building a list.
+        """
+        if naics_codes is None or psc_codes is None:
+            # Whatever tables are loaded (e.g. a full code index); samples only if there are none
+            default_naics, default_psc = self._code_tables()
+            naics_codes = default_naics if naics_codes is None else naics_codes
+            psc_codes = default_psc if psc_codes is None else psc_codes
+        
+        rng = random.Random(seed) if seed is not None else random
+        
+        # Use a subset of templates per code to avoid overfitting
+        naics_templates = COMPILED_NAICS_TEMPLATES[:templates_per_code]
+        psc_templates = COMPILED_PSC_TEMPLATES[:templates_per_code]
         
-        # Initialize code databases
-        naics_codes, psc_codes = self.create_naics_psc_database()
-        
-        training_data = []
-        
-        # NAICS Code Training Examples
-        naics_templates = [
-            "Company operates under NAICS code {code} for {description}",
-            "Primary business classification is NAICS {code} ({description})", 
-            "The contractor's NAICS code {code} indicates {description}",
-            "Vendor specializes in NAICS {code} - {description}",
-            "Business category NAICS {code}: {description}",
-            "Industry classification {code} covers {description}",
-            "NAICS {code} businesses provide {description}",
-            "The firm is registered under {code} for {description}",
-            "Small business set-aside for NAICS code {code}",
-            "Competition restricted to {code} classified businesses",
-            "Contractor must have experience in NAICS {code}",
-            "Primary NAICS: {code}",
-            "NAICS Code: {code}",
-            "{code} - {description}"
-        ]
-        
-        # Generate NAICS training examples
         for code, description in naics_codes.items():
-            for template in naics_templates[:8]:  # Use subset to avoid overfitting
-                if random.random() < 0.7:  # 70% chance to include each example
-                    text = template.format(code=code, description=description)
-                    
-                    # Find position of NAICS code in text
-                    code_start = text.find(code)
-                    if code_start != -1:
-                        code_end = code_start + len(code)
-                        training_data.append((
-                            text, 
-                            {"entities": [(code_start, code_end, "NAICS")]}
-                        ))
-        
-        # PSC Code Training Examples
-        psc_templates = [
-            "Product Service Code {code} covers {description}",
-            "PSC {code}: {description}",
-            "Government procurement under PSC {code} for {description}",
-            "Contract requires {code} certified vendors for {description}",
-            "Service category PSC {code} - {description}", 
-            "Federal acquisition of {code} services ({description})",
-            "PSC Code: {code}",
-            "Product code {code} encompasses {description}",
-            "Supplies under PSC {code} include {description}",
-            "Services classification {code} covers {description}",
-            "The RFP specifies PSC code {code}",
-            "Contract vehicle for {code} - {description}",
-            "SEWP contract covers PSC {code}",
-            "GSA Schedule for {code} services"
-        ]
-        
-        # Generate PSC training examples
+            if not (len(code) == 6 and code.isdigit()):
+                continue  # sector/subsector levels of a full NAICS table
+            for template in naics_templates:
+                if rng.random() < sample_rate:
+                    yield template.render(code=code, description=description)
+        
         for code, description in psc_codes.items():
-            for template in psc_templates[:8]:  # Use subset to avoid overfitting
-                if random.random() < 0.7:  # 70% chance to include each example
-                    text = template.format(code=code, description=description)
-                    
-                    # Find position of PSC code in text
-                    code_start = text.find(code)
-                    if code_start != -1:
-                        code_end = code_start + len(code)
-                        training_data.append((
-                            text,
-                            {"entities": [(code_start, code_end, "PSC")]}
-                        ))
+            for template in psc_templates:
+                if rng.random() < sample_rate:
+                    yield template.render(code=code, description=description)
         
         # Mixed examples with both NAICS and PSC
-        mixed_examples = [
-            ("The contractor specializes in NAICS 541511 services and has experience with PSC 7030 requirements", 
-             {"entities": [(35, 41, "NAICS"), (85, 89, "PSC")]}),
-            
-            ("Small business under NAICS code 541512 seeking PSC D302 opportunities",
-             {"entities": [(32, 38, "NAICS"), (54, 58, "PSC")]}),
-            
-            ("RFP for PSC 7035 services, open to NAICS 541513 classified businesses",
-             {"entities": [(8, 12, "PSC"), (36, 42, "NAICS")]}),
-            
-            ("Contract combines NAICS 518210 data services with PSC R425 engineering support",
-             {"entities": [(18, 24, "NAICS"), (52, 56, "PSC")]}),
-            
-            ("Vendor capabilities: NAICS 334111, PSC codes 7030 and D307",
-             {"entities": [(21, 27, "NAICS"), (40, 44, "PSC"), (49, 53, "PSC")]}),
-        ]
+        for template, values in MIXED_EXAMPLES:
+            yield template.render(**values)
         
-        training_data.extend(mixed_examples)
-        
-        # Add negative examples (text without codes) for better training
-        negative_examples = [
-            ("The company provides excellent software development services", {"entities": []}),
-            ("Government contracting requires careful attention to regulations", {"entities": []}),
-            ("Small business administration supports veteran-owned enterprises", {"entities": []}),
-            ("Information technology solutions for federal agencies", {"entities": []}),
-            ("Professional consulting services available nationwide", {"entities": []}),
-        ]
+        # Negative examples (text without codes) for better training
+        for text in NEGATIVE_EXAMPLES:
+            yield (text, {"entities": []})
+    
+    def generate_training_data(self, seed=None):
+        """
+        Generate comprehensive training data for NAICS and PSC recognition
+        """
+        print("📊 Generating training data for NAICS and PSC codes...")
         
-        training_data.extend(negative_examples)
+        training_data = list(self.iter_training_data(seed=seed))
         
         print(f"✅ Generated {len(training_data)} training examples")
-        print(f"   📋 NAICS examples: ~{len(naics_codes) * 6}")
-        print(f"   📋 PSC examples: ~{len(psc_codes) * 6}")  
-        print(f"   📋 Mixed examples: {len(mixed_examples)}")
-        print(f"   📋 Negative examples: {len(negative_examples)}")
+        print(f"   📋 NAICS examples: ~{len(self.naics_db) * 6}")
+        print(f"   📋 PSC examples: ~{len(self.psc_db) * 6}")  
+        print(f"   📋 Mixed examples: {len(MIXED_EXAMPLES)}")
+        print(f"   📋 Negative examples: {len(NEGATIVE_EXAMPLES)}")
         
         return training_data
     
-    def train_model(self, training_data, iterations=50):
+    def train_model(self, training_data, iterations=50, shuffle_buffer=10_000, batch_size=8):
         """
         Train the model to recognize NAICS and PSC codes
+        training_data can also be a zero-argument callable returning a fresh iterator
+        of examples, e.g. lambda: trainer.iter_training_data(seed=0). Each iteration
+        then streams through it with a bounded shuffle buffer instead of a full list.
         """
         print(f"\n🎓 Training model for {iterations} iterations...")
         print("Training specialized model for government/business codes...")
@@ -216,11 +431,15 @@ class NAICSPSCTrainer:
         
         # Training loop
         for iteration in range(iterations):
-            random.shuffle(training_data)
+            if callable(training_data):
+                epoch_data = _buffered_shuffle(training_data(), shuffle_buffer)
+            else:
+                random.shuffle(training_data)
+                epoch_data = training_data
             losses = {}
             
             # Process in batches
-            for batch in minibatch(training_data, size=8):
+            for batch in minibatch(epoch_data, size=batch_size):
                 examples = []
                 for text, annotations in batch:
                     doc = self.nlp.make_doc(text)
@@ -235,25 +454,161 @@ class NAICSPSCTrainer:
         
         print("✅ Training completed!")
     
+    def train_model_parallel(self, training_data, iterations=50, n_workers=None,
+                             sync_every=5, batch_size=8, shuffle_buffer=10_000):
+        """
+        Data-parallel training across CPU worker processes
+        Each round, the examples are reshuffled into one shard per worker, every worker
+        trains its own copy of the model for sync_every iterations, and the weights
+        are averaged back together (weighted by shard size).
+        training_data can also be a zero-argument callable, as for train_model. Where
+        fork is available the workers inherit it and each streams its own slice
+        (every n_workers-th example) with a bounded shuffle buffer, so no shard is
+        ever built or shipped; pass a seeded callable, e.g.
+        lambda: trainer.iter_training_data(seed=0), so the slices don't overlap.
+        Without fork, each round's stream is dealt into shards in this process.
+        """
+        n_workers = n_workers or os.cpu_count() or 1
+        if n_workers <= 1:
+            return self.train_model(training_data, iterations, shuffle_buffer, batch_size)
+        
+        print(f"\n🎓 Training model for {iterations} iterations on {n_workers} workers...")
+        print(f"Averaging weights every {sync_every} iterations...")
+        
+        # Initialize the model
+        self.nlp.begin_training()
+        config_str = self.nlp.config.to_str()
+        streaming = callable(training_data) and "fork" in multiprocessing.get_all_start_methods()
+        if not callable(training_data):
+            training_data = list(training_data)
+        
+        global _worker_stream
+        _worker_stream = training_data if streaming else None
+        context = multiprocessing.get_context("fork") if streaming else None
+        completed = 0
+        try:
+            with ProcessPoolExecutor(max_workers=n_workers, mp_context=context) as pool:
+                while completed < iterations:
+                    epochs = min(sync_every, iterations - completed)
+                    model_bytes = self.nlp.to_bytes()
+                    
+                    if streaming:
+                        futures = [pool.submit(_train_stream_slice, config_str, model_bytes, index,
+                                               n_workers, epochs, batch_size, shuffle_buffer,
+                                               random.randrange(2**31))
+                                   for index in range(n_workers)]
+                    else:
+                        if callable(training_data):
+                            shards = [[] for _ in range(n_workers)]
+                            stream = _buffered_shuffle(training_data(), shuffle_buffer)
+                            for i, example in enumerate(stream):
+                                shards[i % n_workers].append(example)
+                        else:
+                            random.shuffle(training_data)
+                            shards = [training_data[i::n_workers] for i in range(n_workers)]
+                        futures = [pool.submit(_train_shard, config_str, model_bytes, shard,
+                                               epochs, batch_size, random.randrange(2**31))
+                                   for shard in shards if shard]
+                    results = [result for result in (future.result() for future in futures)
+                               if result[2]]
+                    
+                    _set_model_params(self.nlp, _average_params(results))
+                    completed += epochs
+                    
+                    loss = sum(losses.get("ner", 0) for _, losses, _ in results)
+                    print(f"  Iteration {completed}/{iterations} - Loss: {loss:.4f}")
+        finally:
+            _worker_stream = None
+        
+        print("✅ Training completed!")
+    
+    def export_config_training(self, training_data=None, output_dir="./naics_psc_training",
+                               dev_fraction=0.2, **config_settings):
+        """
+        Write a spaCy v3 config.cfg plus train/dev DocBin corpora for `spacy train`
+        Uses generate_training_data() when no training data is given.
+        Extra keyword arguments (max_epochs, patience, accumulate_gradient...) go into the config.
+        """
+        print(f"📝 Exporting config-driven training setup to {output_dir}...")
+        if training_data is None:
+            training_data = self.generate_training_data()
+        
+        output_dir = Path(output_dir)
+        train_path, dev_path = write_corpora(self.nlp, training_data, output_dir, dev_fraction)
+        config = build_training_config(train_path, dev_path, **config_settings)
+        config_path = output_dir / "config.cfg"
+        config.to_disk(config_path)
+        
+        print(f"✅ Wrote {config_path}, {train_path.name} and {dev_path.name}")
+        return config_path
+    
+    def train_with_config(self, config_path, output_path=None, overrides=None):
+        """
+        Train with the standard spaCy engine (see config_training.run_config_training)
+        and load the best model into this trainer
+        """
+        self.nlp, best_model = run_config_training(config_path, output_path, overrides)
+        self.ner = self.nlp.get_pipe("ner")
+        return best_model
+
+    def _code_tables(self):
+        if self.naics_db is None or self.psc_db is None:
+            self.create_naics_psc_database()
+        return self.naics_db, self.psc_db
+
+    def code_recognizer(self, context_window=40):
+        """
+        Rule-based recognizer over the code tables, for scanning raw text without
+        running the pipeline at all
+        """
+        naics_codes, psc_codes = self._code_tables()
+        return CodeRecognizer(naics_codes, psc_codes, context_window)
+
+    def add_code_recognizer(self, context_window=40):
+        """
+        Put the rule-based code recognizer in front of the ner
+        Codes it is sure about are set as entities and kept by the ner; ambiguous
+        candidates (e.g. a bare "2840") are left for the model to decide.
+        """
+        naics_codes, psc_codes = self._code_tables()
+        if "naics_psc_code_recognizer" in self.nlp.pipe_names:
+            self.nlp.remove_pipe("naics_psc_code_recognizer")
+        position = {"before": "ner"} if "ner" in self.nlp.pipe_names else {}
+        component = self.nlp.add_pipe("naics_psc_code_recognizer",
+                                      config={"context_window": context_window}, **position)
+        component.recognizer = CodeRecognizer(naics_codes, psc_codes, context_window)
+        return component
+
+    @property
+    def validator(self):
+        """CodeValidator over the current code tables, rebuilt only when they change"""
+        naics_codes, psc_codes = self._code_tables()
+        key = (id(naics_codes), len(naics_codes), id(psc_codes), len(psc_codes))
+        if getattr(self, "_validator_key", None) != key:
+            self._validator = CodeValidator(naics_codes, psc_codes)
+            self._validator_key = key
+        return self._validator
+
+    def add_code_validator(self, drop_invalid=False):
+        """Check NAICS/PSC entities inside the pipeline, right after the ner"""
+        if "naics_psc_code_validator" in self.nlp.pipe_names:
+            self.nlp.remove_pipe("naics_psc_code_validator")
+        component = self.nlp.add_pipe("naics_psc_code_validator",
+                                      config={"drop_invalid": drop_invalid})
+        component.validator = self.validator
+        return component
+
     def create_validation_patterns(self):
         """
-        Create regex patterns to validate detected codes
+        Regex patterns to validate detected codes (compiled once at import)
         """
-        patterns = {
-            "NAICS": re.compile(r'^\d{6}$'),  # Exactly 6 digits
-            "PSC": re.compile(r'^[A-Z0-9]{4}$')  # 4 alphanumeric characters
-        }
-        return patterns
+        return VALIDATION_PATTERNS
     
     def validate_entity(self, entity_text, entity_label):
         """
         Validate that detected entities match expected patterns
         """
-        patterns = self.create_validation_patterns()
-        
-        if entity_label in patterns:
-            return patterns[entity_label].match(entity_text.strip())
-        return True
+        return self.validator.validate(entity_text, entity_label)
     
     def test_model(self, test_texts):
         """
@@ -264,15 +619,16 @@ class NAICSPSCTrainer:
         
         total_entities = 0
         valid_entities = 0
+        validator = self.validator
         
-        for text in test_texts:
-            doc = self.nlp(text)
+        for text, doc in zip(test_texts, self.nlp.pipe(test_texts)):
             print(f"\n📄 Text: '{text}'")
             
             if doc.ents:
                 print("   🎯 Detected Codes:")
-                for ent in doc.ents:
-                    is_valid = self.validate_entity(ent.text, ent.label_)
+                statuses = validator.validate_spans(doc.ents)
+                for ent, status in zip(doc.ents, statuses):
+                    is_valid = status != "invalid"
                     validity_mark = "✅" if is_valid else "❌"
                     
                     # Get description if available
@@ -299,6 +655,16 @@ class NAICSPSCTrainer:
             print(f"   Validation accuracy: {accuracy:.1f}%")
         print("=" * 80)
     
+    def evaluate(self, dataset, batch_size=256, n_process=1):
+        """
+        Real precision/recall/F1 for NAICS and PSC on gold-annotated data, plus docs/sec
+        (test_model's validation accuracy only checks the code format)
+        dataset can be (text, annotations) pairs, e.g. iter_training_data(seed=1),
+        Examples, or a .spacy corpus.
+        """
+        print("\n📏 EVALUATING NAICS/PSC CODE RECOGNITION")
+        return report_evaluation(self.nlp, dataset, batch_size, n_process)
+    
     def save_model_with_metadata(self, path="./naics_psc_model"):
         """
         Save model with metadata about codes
@@ -313,8 +679,7 @@ class NAICSPSCTrainer:
         metadata = {
             "model_type": "NAICS_PSC_Recognition",
             "entities": ["NAICS", "PSC"],
-            "naics_codes": self.naics_db,
-            "psc_codes": self.psc_db,
+            **save_code_tables(self.naics_db, self.psc_db, path),
             "validation_patterns": {
                 "NAICS": "6 digits (e.g., 541511)",
                 "PSC": "4 alphanumeric characters (e.g., 7030, D302)"
@@ -327,22 +692,21 @@ class NAICSPSCTrainer:
         print("✅ Model and metadata saved successfully!")
         print(f"📁 Model files saved to: {path}")
     
-    def load_model_with_metadata(self, path="./naics_psc_model"):
+    def load_model_with_metadata(self, path="./naics_psc_model", exclude=()):
         """
         Load model with metadata
+        The metadata is parsed lazily, the first time the code tables are needed.
         """
         print(f"📂 Loading NAICS/PSC model from {path}...")
         
         try:
-            self.nlp = spacy.load(path)
+            self.nlp = spacy.load(path, exclude=exclude)
+            self.ner = self.nlp.get_pipe("ner") if "ner" in self.nlp.pipe_names else None
             
-            # Load metadata
-            metadata_path = f"{path}/metadata.json"
-            if Path(metadata_path).exists():
-                with open(metadata_path, "r") as f:
-                    metadata = json.load(f)
-                self.naics_db = metadata.get("naics_codes", {})
-                self.psc_db = metadata.get("psc_codes", {})
+            # Metadata is read on first use
+            metadata_path = Path(path) / "metadata.json"
+            self._reset_code_tables(metadata_path)
+            if metadata_path.exists():
                 print("✅ Model and metadata loaded successfully!")
             else:
                 print("⚠️ Model loaded, but metadata not found")
@@ -350,6 +714,57 @@ class NAICSPSCTrainer:
         except Exception as e:
             print(f"❌ Error loading model: {e}")
 
+# Model loaded once per worker process of a WarmWorkerPool
+_warm_trainer = None
+
+def _init_warm_worker(path, exclude):
+    global _warm_trainer
+    if _warm_trainer is None:
+        _warm_trainer = NAICSPSCTrainer.from_saved(path, exclude=exclude)
+
+def _warm_recognize(texts):
+    return [[(ent.start_char, ent.end_char, ent.label_) for ent in doc.ents]
+            for doc in _warm_trainer.nlp.pipe(texts)]
+
+class WarmWorkerPool:
+    """
+    Worker processes that load a saved model once and keep it for every job
+    Where fork is available the model is loaded in this process before the workers
+    are forked, so they share its memory copy-on-write and start instantly; other
+    platforms load it once per worker at startup instead.
+    """
+    
+    def __init__(self, path="./naics_psc_model", processes=None, exclude=()):
+        global _warm_trainer
+        exclude = tuple(exclude)
+        forking = "fork" in multiprocessing.get_all_start_methods()
+        if forking:
+            _warm_trainer = NAICSPSCTrainer.from_saved(path, exclude=exclude)
+            _warm_trainer.nlp("NAICS 541511")  # finish any lazy initialization before forking
+            # Keep the garbage collector from writing to (and so copying) shared pages
+            gc.freeze()
+        context = multiprocessing.get_context("fork" if forking else "spawn")
+        self.pool = context.Pool(processes, initializer=_init_warm_worker,
+                                 initargs=(str(path), exclude))
+        if forking:
+            gc.unfreeze()
+    
+    def recognize(self, texts, chunk_size=64):
+        """(start_char, end_char, label) entities for each text, in input order"""
+        texts = list(texts)
+        chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+        return [ents for chunk in self.pool.imap(_warm_recognize, chunks) for ents in chunk]
+    
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
 def demonstrate_naics_psc_training():
     """
     Complete demonstration of NAICS/PSC code recognition training
@@ -438,13 +853,14 @@ def quick_usage_example():
     trainer.test_model([business_text])
     
 if __name__ == "__main__":
-    print("Choose training mode:")
-    print("1. Complete demonstration (recommended)")
-    print("2. Quick usage example")
+    import argparse
     
-    choice = input("Enter 1 or 2: ").strip()
+    parser = argparse.ArgumentParser(description="NAICS/PSC training demos (see ner_cli.py train for real jobs)")
+    parser.add_argument("--mode", choices=["demo", "quick"], default="demo",
+                        help="complete demonstration (default) or the quick usage example")
+    args = parser.parse_args()
     
-    if choice == "2":
+    if args.mode == "quick":
         quick_usage_example()
     else:
         trainer = demonstrate_naics_psc_training()
@@ -454,4 +870,4 @@ if __name__ == "__main__":
     print("2. Add more NAICS/PSC codes to the training database") 
     print("3. Fine-tune with domain-specific text (contracts, RFPs)")
     print("4. Integrate with document processing pipelines")
-    print("\nYou now have a specialized NLP model for government/business codes! 🎯")
\ No newline at end of file
+    print("\nYou now have a specialized NLP model for government/business codes! 🎯")
@@ -0,0 +1,228 @@
+"""
+Command-line batch runner
+
+    python ner_cli.py extract "articles/**/*.txt" --n-process 4 --format jsonl -o entities.jsonl
+    cat texts.txt | python ner_cli.py extract - --format csv > entities.csv
+    python ner_cli.py extract "articles/*.txt" --format docbin -o ./docs
+    python ner_cli.py train custom --data training_data.json --output ./custom_ner_model
+    python ner_cli.py train naics --iterations 30 --workers 4 --output ./naics_psc_model
+    python ner_cli.py evaluate ./naics_psc_model dev.spacy --n-process 4
+    python ner_cli.py bench -- --entry extract custom --corpus short --docs 500
+
+Inputs are files, globs (** recurses) or "-" for stdin, one document per line.
+Progress and throughput go to stderr, so stdout can be piped.
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import runpy
+import sys
+import time
+from collections import deque
+from pathlib import Path
+
+import spacy
+
+import naics_psc_recognizer  # registers the components saved NAICS/PSC models use
+import pipeline_assembly  # registers entity_stash/entity_merge for assembled models
+from docbin_store import DocBinWriter
+from enhanced_entity_extractor_CustomEntity import extract_entities_batch
+from evaluation import evaluate, format_evaluation
+from result_cache import ResultCache
+from training_corpus import load_training_json
+
+REPO_ROOT = Path(__file__).resolve().parent
+
+class ProgressMeter:
+    """Docs done and docs/sec on stderr, redrawn at most every `interval` seconds"""
+
+    def __init__(self, enabled=True, interval=1.0, stream=sys.stderr):
+        self.enabled = enabled
+        self.interval = interval
+        self.stream = stream
+        self.docs = 0
+        self.start = time.perf_counter()
+        self._last_draw = 0.0
+
+    def update(self, docs=1):
+        self.docs += docs
+        now = time.perf_counter()
+        if self.enabled and now - self._last_draw >= self.interval:
+            self._last_draw = now
+            self._draw(now, end="\r")
+
+    def _draw(self, now, end):
+        elapsed = now - self.start
+        rate = self.docs / elapsed if elapsed else 0.0
+        self.stream.write(f"  {self.docs:>10,} docs  {elapsed:8.1f}s  {rate:9.1f} docs/sec{end}")
+        self.stream.flush()
+
+    def finish(self):
+        if self.enabled:
+            self._draw(time.perf_counter(), end="\n")
+
+def expand_inputs(patterns):
+    """Yield (source, Path or text) for every file matching the patterns, or stdin lines for "-" """
+    for pattern in patterns:
+        if pattern == "-":
+            for number, line in enumerate(sys.stdin, 1):
+                line = line.rstrip("\n")
+                if line.strip():
+                    yield f"stdin:{number}", line
+            continue
+        paths = sorted(glob.glob(pattern, recursive=True)) or [pattern]
+        for path in paths:
+            if os.path.isfile(path):
+                yield path, Path(path)
+            else:
+                print(f"⚠️  No such file: {path}", file=sys.stderr)
+
+def resolve_n_process(n_process):
+    """-1 means one process per CPU"""
+    return (os.cpu_count() or 1) if n_process < 0 else n_process
+
+def run_extract(args):
+    sources = deque()
+
+    def items():
+        for source, item in expand_inputs(args.inputs):
+            sources.append(source)
+            yield item
+
+    cache = ResultCache(args.cache) if args.cache else None
+    docbin_writer = None
+    if args.format == "docbin":
+        if not args.output:
+            sys.exit("--format docbin needs --output DIRECTORY")
+        docbin_writer = DocBinWriter(args.output)
+
+    output = sys.stdout
+    if args.output and args.format != "docbin":
+        output = open(args.output, "w", encoding="utf-8", newline="")
+    writer = None
+    if args.format == "csv":
+        writer = csv.writer(output)
+        writer.writerow(["source", "text", "label", "description", "is_custom"])
+
+    progress = ProgressMeter(enabled=not args.quiet)
+    results = extract_entities_batch(items(), batch_size=args.batch_size,
+                                     n_process=resolve_n_process(args.n_process),
+                                     model_name=args.model, gazetteer_path=args.gazetteer,
+                                     entities_only=not args.full_pipeline, cache=cache,
+                                     docbin_writer=docbin_writer)
+    try:
+        for entities in results:
+            source = sources.popleft()
+            if args.format == "jsonl":
+                output.write(json.dumps({"source": source, "entities": entities}) + "\n")
+            elif args.format == "csv":
+                for entity in entities:
+                    writer.writerow([source, entity["text"], entity["label"],
+                                     entity["description"], entity["is_custom"]])
+            progress.update()
+    finally:
+        progress.finish()
+        if docbin_writer is not None:
+            docbin_writer.close()
+        if output is not sys.stdout:
+            output.close()
+        if cache is not None:
+            cache.close()
+
+def run_train(args):
+    if args.trainer == "custom":
+        from custom_entity_training import CustomEntityTrainer
+        trainer = CustomEntityTrainer(args.base_model)
+        data = args.data or trainer.prepare_training_data()
+        if args.config:
+            config_path = trainer.export_config_training(data, Path(args.output).parent / "custom_ner_training")
+            trainer.train_with_config(config_path)
+        else:
+            trainer.train_model(data, iterations=args.iterations)
+        trainer.save_model(args.output)
+        return
+
+    from naics_psc_trainer import NAICSPSCTrainer
+    trainer = NAICSPSCTrainer()
+    if args.code_index:
+        trainer.use_code_index(*args.code_index)
+    data = load_training_json(args.data) if args.data else trainer.generate_training_data(seed=args.seed)
+    if args.config:
+        config_path = trainer.export_config_training(data, Path(args.output).parent / "naics_psc_training")
+        trainer.train_with_config(config_path)
+    elif args.workers > 1:
+        trainer.train_model_parallel(data, iterations=args.iterations, n_workers=args.workers)
+    else:
+        trainer.train_model(data, iterations=args.iterations)
+    trainer.add_code_recognizer()
+    trainer.save_model_with_metadata(args.output)
+
+def run_evaluate(args):
+    nlp = spacy.load(args.model)
+    scores = evaluate(nlp, args.data, batch_size=args.batch_size,
+                      n_process=resolve_n_process(args.n_process))
+    print(format_evaluation(scores))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(scores, f, indent=2)
+
+def run_bench(args):
+    script = REPO_ROOT / "benchmarks" / "run_benchmarks.py"
+    bench_args = args.bench_args[1:] if args.bench_args[:1] == ["--"] else args.bench_args
+    sys.argv = [str(script), *bench_args]
+    runpy.run_path(str(script), run_name="__main__")
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Batch entity extraction, training and evaluation")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    extract = commands.add_parser("extract", help="extract entities from files or stdin")
+    extract.add_argument("inputs", nargs="+", help='files, globs ("docs/**/*.txt") or - for stdin')
+    extract.add_argument("--model", default="en_core_web_sm")
+    extract.add_argument("--gazetteer", help="PRODUCT/EVENT gazetteer file")
+    extract.add_argument("--full-pipeline", action="store_true",
+                         help="also run the components the entities don't need")
+    extract.add_argument("--format", choices=["jsonl", "csv", "docbin"], default="jsonl")
+    extract.add_argument("-o", "--output", help="output file (directory for docbin); default stdout")
+    extract.add_argument("--batch-size", type=int, default=64)
+    extract.add_argument("--n-process", type=int, default=1, help="-1 for one process per CPU")
+    extract.add_argument("--cache", help="SQLite result cache file")
+    extract.add_argument("-q", "--quiet", action="store_true", help="no progress meter")
+    extract.set_defaults(run=run_extract)
+
+    train = commands.add_parser("train", help="train the custom or NAICS/PSC model")
+    train.add_argument("trainer", choices=["custom", "naics"])
+    train.add_argument("--data", help="training JSON (custom also takes a .spacy corpus); "
+                                      "default: the built-in examples")
+    train.add_argument("--output", required=True, help="directory to save the model to")
+    train.add_argument("--iterations", type=int, default=30)
+    train.add_argument("--base-model", default="en_core_web_sm", help="custom: model to start from")
+    train.add_argument("--config", action="store_true", help="train with the spaCy config engine")
+    train.add_argument("--workers", type=int, default=1, help="naics: data-parallel worker processes")
+    train.add_argument("--code-index", nargs=2, metavar=("NAICS_IDX", "PSC_IDX"),
+                       help="naics: full code tables (see naics_psc_index.py)")
+    train.add_argument("--seed", type=int, default=0)
+    train.set_defaults(run=run_train)
+
+    evaluate_cmd = commands.add_parser("evaluate", help="precision/recall/F1 on gold data")
+    evaluate_cmd.add_argument("model")
+    evaluate_cmd.add_argument("data", help=".spacy corpus or training JSON")
+    evaluate_cmd.add_argument("--batch-size", type=int, default=256)
+    evaluate_cmd.add_argument("--n-process", type=int, default=1, help="-1 for one process per CPU")
+    evaluate_cmd.add_argument("-o", "--output", help="also write the scores as JSON")
+    evaluate_cmd.set_defaults(run=run_evaluate)
+
+    bench = commands.add_parser("bench", help="run benchmarks/run_benchmarks.py")
+    bench.add_argument("bench_args", nargs=argparse.REMAINDER,
+                       help="arguments for run_benchmarks.py (after --)")
+    bench.set_defaults(run=run_bench)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.run(args)
+
+if __name__ == "__main__":
+    main()
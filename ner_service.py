@@ -0,0 +1,296 @@
+"""
+Asyncio HTTP service for entity extraction
+
+The pipeline is loaded once at startup. Concurrent requests are collected into
+micro-batches (up to --max-batch-size texts, waiting at most --max-wait-ms for a
+batch to fill) and run through nlp.pipe in a thread pool, or in worker processes
+with --processes. When the queue is full, requests get 503 with Retry-After;
+a request with more texts than the whole queue holds gets 413.
+
+Usage:
+    python ner_service.py --model en_core_web_sm --port 8080
+
+    curl -s localhost:8080/extract -d '{"text": "Apple released the iPhone 15 in Cupertino."}'
+    curl -s localhost:8080/extract -d '{"texts": ["first text", "second text"]}'
+    curl -s localhost:8080/metrics
+    curl -s localhost:8080/healthz
+"""
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import naics_psc_recognizer  # registers the components saved NAICS/PSC models use
+import pipeline_assembly  # registers entity_stash/entity_merge for assembled models
+from enhanced_entity_extractor_CustomEntity import doc_to_result, get_pipeline
+from pipeline_metrics import RunMetrics, to_prometheus_text
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+class QueueFullError(Exception):
+    """Raised when the batcher can't take more texts right now"""
+
+class RequestTooLargeError(Exception):
+    """Raised when one request holds more texts than the queue can ever take"""
+
+def docs_to_json(docs):
+    """Plain entity dicts with character offsets, safe to pickle between processes"""
+    results = []
+    for doc in docs:
+        result = doc_to_result(doc)
+        results.append([dict(entity, start=start, end=end) for entity, start, end
+                        in zip(result.to_dicts(), result.starts, result.ends)])
+    return results
+
+# Pipeline of a --processes worker, loaded once by its initializer
+_worker_nlp = None
+
+def _init_worker(model_name, gazetteer_path, entities_only):
+    global _worker_nlp
+    _worker_nlp = get_pipeline(model_name, gazetteer_path, entities_only)
+
+def _extract_in_worker(texts):
+    return docs_to_json(_worker_nlp.pipe(texts, batch_size=len(texts)))
+
+class MicroBatcher:
+    """
+    Collects texts from concurrent requests into batches for nlp.pipe
+    A batch is sent as soon as it holds max_batch_size texts or the oldest text
+    has waited max_wait_ms. At most `workers` batches run at the same time.
+    """
+
+    def __init__(self, nlp=None, max_batch_size=32, max_wait_ms=5, max_queue=1024,
+                 workers=1, process_pool=None, metrics=None):
+        self.nlp = nlp
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.metrics = metrics if metrics is not None else RunMetrics(keep_documents=False)
+        self.in_flight = 0
+        self.workers = workers
+        self.executor = process_pool or ThreadPoolExecutor(workers, thread_name_prefix="ner")
+        self._tasks = []
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._collect()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self.executor.shutdown(wait=True)
+
+    @property
+    def queue_depth(self):
+        return self.queue.qsize()
+
+    async def submit(self, texts):
+        """Entities for each text; raises QueueFullError instead of waiting for room"""
+        if self.queue.maxsize and len(texts) > self.queue.maxsize:
+            self.metrics.increment("rejected_requests")
+            raise RequestTooLargeError()
+        if self.queue.maxsize and self.queue.qsize() + len(texts) > self.queue.maxsize:
+            self.metrics.increment("rejected_requests")
+            raise QueueFullError()
+        loop = asyncio.get_running_loop()
+        futures = []
+        for text in texts:
+            future = loop.create_future()
+            self.queue.put_nowait((text, future, time.perf_counter()))
+            futures.append(future)
+        return await asyncio.gather(*futures)
+
+    async def _next_batch(self):
+        batch = [await self.queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _extract(self, texts):
+        return docs_to_json(self.nlp.pipe(texts, batch_size=len(texts)))
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        work = _extract_in_worker if isinstance(self.executor, ProcessPoolExecutor) else self._extract
+        while True:
+            batch = await self._next_batch()
+            started = time.perf_counter()
+            for _, _, enqueued in batch:
+                self.metrics.record_duration("queue_wait", started - enqueued)
+
+            self.in_flight += len(batch)
+            try:
+                results = await loop.run_in_executor(self.executor, work, [text for text, _, _ in batch])
+            except Exception as e:
+                results = [e] * len(batch)
+            finally:
+                self.in_flight -= len(batch)
+            self.metrics.record_duration("batch_inference", time.perf_counter() - started)
+            self.metrics.increment("batches")
+            self.metrics.increment("documents", len(batch))
+
+            for (_, future, _), result in zip(batch, results):
+                if future.done():
+                    continue  # the client went away
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    self.metrics.increment("entities", len(result))
+                    future.set_result(result)
+
+class ExtractionService:
+    """HTTP front end: /extract, /metrics and /healthz"""
+
+    def __init__(self, batcher):
+        self.batcher = batcher
+
+    def metrics_text(self):
+        prefix = "ner_service"
+        lines = [to_prometheus_text(self.batcher.metrics, prefix=prefix).rstrip("\n"),
+                 f"# TYPE {prefix}_queue_depth gauge",
+                 f"{prefix}_queue_depth {self.batcher.queue_depth}",
+                 f"# TYPE {prefix}_queue_capacity gauge",
+                 f"{prefix}_queue_capacity {self.batcher.queue.maxsize}",
+                 f"# TYPE {prefix}_in_flight gauge",
+                 f"{prefix}_in_flight {self.batcher.in_flight}"]
+        return "\n".join(lines) + "\n"
+
+    async def route(self, method, path, body):
+        """Return (status, content_type, payload, extra_headers)"""
+        if path == "/healthz" and method == "GET":
+            return 200, "application/json", {"status": "ok", "queue_depth": self.batcher.queue_depth}, {}
+        if path == "/metrics" and method == "GET":
+            return 200, "text/plain; version=0.0.4", self.metrics_text(), {}
+        if path != "/extract":
+            return 404, "application/json", {"error": "not found"}, {}
+        if method != "POST":
+            return 405, "application/json", {"error": "use POST"}, {"Allow": "POST"}
+
+        try:
+            request = json.loads(body or b"{}")
+            single = "text" in request
+            texts = [request["text"]] if single else request["texts"]
+            if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                raise TypeError
+        except (ValueError, KeyError, TypeError):
+            return 400, "application/json", {"error": 'expected {"text": "..."} or {"texts": [...]}'}, {}
+
+        self.batcher.metrics.increment("requests")
+        try:
+            results = await self.batcher.submit(texts)
+        except RequestTooLargeError:
+            return 413, "application/json", {
+                "error": f"too many texts, send at most {self.batcher.queue.maxsize} per request"}, {}
+        except QueueFullError:
+            return 503, "application/json", {"error": "overloaded, retry later"}, {"Retry-After": "1"}
+        if single:
+            return 200, "application/json", {"entities": results[0]}, {}
+        return 200, "application/json", {"results": [{"entities": ents} for ents in results]}, {}
+
+    async def handle_connection(self, reader, writer):
+        """Minimal HTTP/1.1 with keep-alive - enough for clients, load balancers and curl"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_BYTES:
+                    response = (413, "application/json", {"error": "request too large"}, {})
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    response = await self.route(method, path.split("?")[0], body)
+                    keep_alive = (headers.get("connection", "").lower() != "close"
+                                  and version == "HTTP/1.1")
+
+                await self._respond(writer, *response, keep_alive=keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status, content_type, payload, extra_headers, keep_alive):
+        body = payload if isinstance(payload, str) else json.dumps(payload)
+        body = body.encode("utf-8")
+        reasons = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                   413: "Payload Too Large", 503: "Service Unavailable"}
+        head = [f"HTTP/1.1 {status} {reasons.get(status, '')}",
+                f"Content-Type: {content_type}",
+                f"Content-Length: {len(body)}",
+                f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        head += [f"{name}: {value}" for name, value in extra_headers.items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+async def serve(host="127.0.0.1", port=8080, model_name="en_core_web_sm", gazetteer_path=None,
+                entities_only=True, max_batch_size=32, max_wait_ms=5, max_queue=1024,
+                threads=1, processes=0):
+    """Load the pipeline once and serve until cancelled"""
+    process_pool = None
+    nlp = None
+    if processes:
+        process_pool = ProcessPoolExecutor(processes, initializer=_init_worker,
+                                           initargs=(model_name, gazetteer_path, entities_only))
+    else:
+        nlp = get_pipeline(model_name, gazetteer_path, entities_only)
+
+    batcher = MicroBatcher(nlp, max_batch_size, max_wait_ms, max_queue,
+                           workers=processes or threads, process_pool=process_pool)
+    batcher.start()
+    service = ExtractionService(batcher)
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    print(f"🚀 Serving {model_name} on http://{host}:{port} (POST /extract, GET /metrics, GET /healthz)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await batcher.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Entity extraction HTTP service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--model", default="en_core_web_sm")
+    parser.add_argument("--gazetteer", help="PRODUCT/EVENT gazetteer file")
+    parser.add_argument("--full-pipeline", action="store_true",
+                        help="also run the components the entities don't need")
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    parser.add_argument("--max-queue", type=int, default=1024,
+                        help="texts waiting beyond this are rejected with 503 "
+                             "(413 for a single request larger than the queue)")
+    parser.add_argument("--threads", type=int, default=1, help="batches run concurrently in threads")
+    parser.add_argument("--processes", type=int, default=0,
+                        help="run batches in this many worker processes instead of threads")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.model, args.gazetteer,
+                          not args.full_pipeline, args.max_batch_size, args.max_wait_ms,
+                          args.max_queue, args.threads, args.processes))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
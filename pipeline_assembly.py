@@ -0,0 +1,128 @@
+"""
+Build one spaCy pipeline out of the base model, the PRODUCT/EVENT component and
+the saved custom and NAICS/PSC models, so every document is tokenized once and
+only one model stack is held in memory.
+
+A ner respects entities that are already on the Doc, so a second ner can't claim
+tokens the first one labelled. Each group of components therefore runs on a
+clean Doc: "entity_stash" moves the group's entities into doc.spans, and
+"entity_merge" combines all the groups at the end in priority order.
+"""
+from pathlib import Path
+
+import spacy
+from spacy.language import Language
+
+import naics_psc_recognizer  # registers the naics_psc_* factories for sourcing
+from enhanced_entity_extractor_CustomEntity import add_product_event_component
+
+# Earlier groups win overlaps: confident code matches first, the base model last
+DEFAULT_PRIORITY = ("naics", "custom", "base")
+
+class EntityStash:
+    """Move the current entities into doc.spans[key] and clear doc.ents"""
+
+    def __init__(self, key):
+        self.key = key
+
+    def __call__(self, doc):
+        doc.spans[self.key] = list(doc.ents)
+        # "missing" rather than "outside", or the next ner would read every token as O
+        doc.set_ents([], default="missing")
+        return doc
+
+class EntityMerge:
+    """
+    Combine the stashed entity groups into doc.ents
+    Spans from keys earlier in the list win; within a group, existing
+    entities are already non-overlapping.
+    """
+
+    def __init__(self, keys, keep_sources=False):
+        self.keys = list(keys)
+        self.keep_sources = keep_sources
+
+    def __call__(self, doc):
+        taken = bytearray(len(doc))
+        merged = []
+        for key in self.keys:
+            if key not in doc.spans:
+                continue
+            for span in doc.spans[key]:
+                if any(taken[span.start:span.end]):
+                    continue
+                taken[span.start:span.end] = b"\x01" * (span.end - span.start)
+                merged.append(span)
+            if not self.keep_sources:
+                del doc.spans[key]
+        doc.set_ents(merged, default="outside")
+        return doc
+
+@Language.factory("entity_stash", default_config={"key": "entities"},
+                  assigns=["doc.spans", "doc.ents"])
+def create_entity_stash(nlp, name, key):
+    return EntityStash(key)
+
+@Language.factory("entity_merge", default_config={"keys": list(DEFAULT_PRIORITY), "keep_sources": False},
+                  assigns=["doc.ents", "token.ent_type", "token.ent_iob"])
+def create_entity_merge(nlp, name, keys, keep_sources):
+    return EntityMerge(keys, keep_sources)
+
+def _same_weights(nlp, source, name):
+    """Is component `name` identical in both pipelines (e.g. a tok2vec frozen while fine-tuning)?"""
+    if name not in nlp.pipe_names or name not in source.pipe_names:
+        return False
+    return nlp.get_pipe(name).to_bytes() == source.get_pipe(name).to_bytes()
+
+def source_ner(nlp, source, name, after):
+    """
+    Copy the ner of a loaded `source` pipeline into nlp as `name`
+    If it listens to a tok2vec that is identical to the one in nlp, the copy shares
+    it; otherwise the ner gets its own copy of the embedding layers.
+    """
+    for upstream, component in list(source.pipeline):
+        if "ner" in getattr(component, "listening_components", []) and not _same_weights(nlp, source, upstream):
+            source.replace_listeners(upstream, "ner", ["model.tok2vec"])
+    return nlp.add_pipe("ner", name=name, source=source, after=after)
+
+def _stash(nlp, group):
+    nlp.add_pipe("entity_stash", name=f"stash_{group}", config={"key": f"entities_{group}"}, last=True)
+
+def assemble_pipeline(base_model="en_core_web_sm", custom_model=None, naics_model=None,
+                      gazetteer_path=None, priority=DEFAULT_PRIORITY):
+    """
+    Build the combined pipeline
+    custom_model and naics_model are saved model directories (e.g. ./custom_ner_model
+    and ./naics_psc_model); either can be left out. Only their ner (plus the NAICS
+    code recognizer, when the model has one) is taken - the tokenizer and all the
+    other components come from base_model.
+    """
+    nlp = spacy.load(base_model)
+    add_product_event_component(nlp, gazetteer_path)
+    _stash(nlp, "base")
+
+    if custom_model is not None:
+        custom = spacy.load(custom_model)
+        source_ner(nlp, custom, "custom_ner", after="stash_base")
+        _stash(nlp, "custom")
+
+    if naics_model is not None:
+        naics = spacy.load(naics_model)
+        if "naics_psc_code_recognizer" in naics.pipe_names:
+            nlp.add_pipe("naics_psc_code_recognizer", source=naics, last=True)
+        source_ner(nlp, naics, "naics_ner", after=nlp.pipe_names[-1])
+        _stash(nlp, "naics")
+
+    nlp.add_pipe("entity_merge", last=True,
+                 config={"keys": [f"entities_{group}" for group in priority]})
+    return nlp
+
+def save_assembled_pipeline(nlp, path):
+    """
+    Save the combined pipeline; load it again with spacy.load after importing this
+    module (which registers the entity_stash/entity_merge factories)
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    nlp.to_disk(path)
+    return path
@@ -0,0 +1,134 @@
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+class MetricsSink(ABC):
+    """
+    Interface for receiving timing and counter events from the extraction pipeline
+    Subclass this (or use CallbackSink) to forward metrics to your own system.
+    """
+
+    @abstractmethod
+    def record_duration(self, stage, seconds, doc_id=None):
+        """Called once per timed stage"""
+
+    @abstractmethod
+    def increment(self, counter, value=1, doc_id=None):
+        """Called to bump a counter (documents, tokens, entities...)"""
+
+class CallbackSink(MetricsSink):
+    """
+    Forward every event to a single callback(kind, name, value, doc_id)
+    kind is "duration" or "counter".
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def record_duration(self, stage, seconds, doc_id=None):
+        self.callback("duration", stage, seconds, doc_id)
+
+    def increment(self, counter, value=1, doc_id=None):
+        self.callback("counter", counter, value, doc_id)
+
+class RunMetrics(MetricsSink):
+    """
+    In-memory sink that aggregates stage durations and counters across a run
+    With keep_documents=True it also keeps a per-document breakdown.
+    """
+
+    def __init__(self, keep_documents=True):
+        self.keep_documents = keep_documents
+        self.stages = {}
+        self.counters = {}
+        self.documents = {}
+        self._lock = threading.Lock()
+
+    def record_duration(self, stage, seconds, doc_id=None):
+        with self._lock:
+            stats = self.stages.setdefault(stage, {"count": 0, "total": 0.0,
+                                                   "min": seconds, "max": seconds})
+            stats["count"] += 1
+            stats["total"] += seconds
+            stats["min"] = min(stats["min"], seconds)
+            stats["max"] = max(stats["max"], seconds)
+
+            if self.keep_documents and doc_id is not None:
+                durations = self.documents.setdefault(doc_id, {}).setdefault("durations", {})
+                durations[stage] = durations.get(stage, 0.0) + seconds
+
+    def increment(self, counter, value=1, doc_id=None):
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+            if self.keep_documents and doc_id is not None:
+                counters = self.documents.setdefault(doc_id, {}).setdefault("counters", {})
+                counters[counter] = counters.get(counter, 0) + value
+
+    def summary(self):
+        """Aggregated view: per-stage count/total/mean/min/max plus counters"""
+        with self._lock:
+            stages = {}
+            for stage, stats in self.stages.items():
+                stages[stage] = dict(stats, mean=stats["total"] / stats["count"])
+            return {"stages": stages, "counters": dict(self.counters)}
+
+@contextmanager
+def stage_timer(sink, stage, doc_id=None):
+    """
+    Time a block of code and report it to the sink
+    Does nothing when sink is None, so callers can leave instrumentation in place.
+    """
+    if sink is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        sink.record_duration(stage, time.perf_counter() - start, doc_id)
+
+def to_json(metrics, include_documents=False):
+    """Export a RunMetrics as a JSON string"""
+    data = metrics.summary()
+    if include_documents:
+        data["documents"] = {str(doc_id): values for doc_id, values in metrics.documents.items()}
+    return json.dumps(data, indent=2)
+
+def _prometheus_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def to_prometheus_text(metrics, prefix="ner"):
+    """
+    Export a RunMetrics in the Prometheus text exposition format
+    Can be written to a file for the node_exporter textfile collector or served over HTTP.
+    """
+    summary = metrics.summary()
+    lines = [
+        f"# HELP {prefix}_stage_seconds_total Total time spent in each pipeline stage",
+        f"# TYPE {prefix}_stage_seconds_total counter",
+    ]
+    for stage, stats in sorted(summary["stages"].items()):
+        lines.append(f'{prefix}_stage_seconds_total{{stage="{_prometheus_label(stage)}"}} {stats["total"]:.9f}')
+
+    lines += [
+        f"# HELP {prefix}_stage_calls_total Number of times each pipeline stage ran",
+        f"# TYPE {prefix}_stage_calls_total counter",
+    ]
+    for stage, stats in sorted(summary["stages"].items()):
+        lines.append(f'{prefix}_stage_calls_total{{stage="{_prometheus_label(stage)}"}} {stats["count"]}')
+
+    lines += [
+        f"# HELP {prefix}_stage_seconds_max Slowest single run of each pipeline stage",
+        f"# TYPE {prefix}_stage_seconds_max gauge",
+    ]
+    for stage, stats in sorted(summary["stages"].items()):
+        lines.append(f'{prefix}_stage_seconds_max{{stage="{_prometheus_label(stage)}"}} {stats["max"]:.9f}')
+
+    for counter, value in sorted(summary["counters"].items()):
+        name = f"{prefix}_{counter}_total"
+        lines += [f"# TYPE {name} counter", f"{name} {value}"]
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import weakref
+from collections import OrderedDict
+
+import spacy
+
+# Content hashes of loaded pipelines, computed once per Language object
+_content_hashes = weakref.WeakKeyDictionary()
+
+def pipeline_content_hash(nlp):
+    """
+    Hash of the tokenizer and every component's serialized weights
+    Locally trained models all share the default name and version, so this is what
+    tells two of them (or one retrained in place) apart. It is computed on first
+    use and remembered for this pipeline object.
+    """
+    if nlp not in _content_hashes:
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(nlp.tokenizer.to_bytes(exclude=["vocab"]))
+        for name, proc in nlp.pipeline:
+            digest.update(name.encode("utf-8"))
+            if hasattr(proc, "to_bytes"):
+                digest.update(proc.to_bytes(exclude=["vocab"]))
+        _content_hashes[nlp] = digest.hexdigest()
+    return _content_hashes[nlp]
+
+def pipeline_fingerprint(nlp):
+    """
+    Identify everything that can change extraction results: model name, version
+    and weights, spaCy version, active components and the PRODUCT/EVENT pattern set
+    """
+    meta = nlp.meta
+    parts = [
+        f"{meta.get('lang', '')}_{meta.get('name', '')}-{meta.get('version', '')}",
+        f"weights-{pipeline_content_hash(nlp)}",
+        f"spacy-{spacy.__version__}",
+        "pipes-" + ",".join(nlp.pipe_names),
+    ]
+    if "product_event_entities" in nlp.pipe_names:
+        config = nlp.get_pipe_config("product_event_entities")
+        parts.append(f"patterns-{config.get('pattern_version')}")
+    return "|".join(parts)
+
+class ResultCache:
+    """
+    Content-hash cache for extraction results
+    An in-memory LRU sits in front of an optional on-disk SQLite tier.
+    Keys combine the text hash with the pipeline fingerprint, so entries made
+    with another model version or pattern set are never returned.
+    Disk writes are committed every commit_every puts and on flush()/close().
+    Every get returns a fresh copy, so callers may modify what they get back.
+    """
+
+    def __init__(self, path=None, max_memory_entries=10_000, commit_every=100):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.commit_every = commit_every
+        self._uncommitted = 0
+        self._memory = OrderedDict()  # key -> value as JSON text
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0}
+
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, value TEXT NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(text, fingerprint):
+        """Hash of the text plus the pipeline fingerprint"""
+        digest = hashlib.sha256()
+        digest.update(fingerprint.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the cached value for key, or None"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return json.loads(self._memory[key])
+
+            if self._db is not None:
+                row = self._db.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._remember(key, row[0])
+                    self.stats["disk_hits"] += 1
+                    return json.loads(row[0])
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key, value, fingerprint=""):
+        """Store a JSON-serializable value in both tiers"""
+        text = json.dumps(value)
+        with self._lock:
+            self._remember(key, text)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+                                 (key, fingerprint, text))
+                self._uncommitted += 1
+                if self._uncommitted >= self.commit_every:
+                    self._commit()
+            self.stats["writes"] += 1
+
+    def flush(self):
+        """Commit pending disk writes"""
+        with self._lock:
+            if self._db is not None:
+                self._commit()
+
+    def _commit(self):
+        self._db.commit()
+        self._uncommitted = 0
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def purge_stale(self, fingerprint):
+        """
+        Delete on-disk entries made with any other pipeline fingerprint
+        Returns the number of rows removed.
+        """
+        with self._lock:
+            self._memory.clear()
+            if self._db is None:
+                return 0
+            cursor = self._db.execute("DELETE FROM results WHERE fingerprint != ?", (fingerprint,))
+            self._commit()
+            return cursor.rowcount
+
+    def hit_rate(self):
+        lookups = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["misses"]
+        if lookups == 0:
+            return 0.0
+        return (self.stats["memory_hits"] + self.stats["disk_hits"]) / lookups
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM results")
+                self._commit()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._commit()
+                self._db.close()
+                self._db = None
@@ -0,0 +1,23 @@
+import spacy
+
+import ner_cli
+from docbin_store import count_docbin_docs
+
+def test_extract_docbin_with_cache_keeps_cached_texts(tmp_path):
+    model = tmp_path / "model"
+    nlp = spacy.blank("en")
+    nlp.add_pipe("entity_ruler").add_patterns([{"label": "ORG", "pattern": "Apple"}])
+    nlp.to_disk(model)
+
+    inputs = tmp_path / "articles"
+    inputs.mkdir()
+    (inputs / "a.txt").write_text("Apple makes phones.", encoding="utf-8")
+    (inputs / "b.txt").write_text("Nothing to see here.", encoding="utf-8")
+    cache = tmp_path / "cache.db"
+
+    # The second run is served entirely from the cache, but must export the same docs
+    for run in ("cold", "warm"):
+        output = tmp_path / f"docs-{run}"
+        ner_cli.main(["extract", str(inputs / "*.txt"), "--model", str(model),
+                      "--format", "docbin", "-o", str(output), "--cache", str(cache), "--quiet"])
+        assert count_docbin_docs(output) == 2
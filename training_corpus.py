@@ -0,0 +1,120 @@
+import json
+from pathlib import Path
+
+from spacy.tokens import DocBin
+from spacy.training import Example
+from spacy.util import filter_spans
+
+def make_reference_doc(nlp, text, annotations):
+    """
+    Tokenize one text and set its gold entities
+    Returns (doc, skipped) where skipped counts entities that don't line up
+    with token boundaries.
+    """
+    doc = nlp.make_doc(text)
+    spans = []
+    missing = []
+    skipped = 0
+    for start, end, label in annotations.get("entities", []):
+        span = doc.char_span(start, end, label=label)
+        if span is None:
+            # Like Example.from_dict, misaligned entities become missing
+            # annotation rather than teaching the model "not an entity"
+            skipped += 1
+            missing_span = doc.char_span(start, end, alignment_mode="expand")
+            if missing_span is not None:
+                missing.append(missing_span)
+        else:
+            spans.append(span)
+    spans = filter_spans(spans)
+    missing = [span for span in missing
+               if not any(span.start < ent.end and ent.start < span.end for ent in spans)]
+    doc.set_ents(spans, missing=filter_spans(missing), default="outside")
+    return doc, skipped
+
+def training_data_to_docbin(nlp, training_data):
+    """
+    Convert (text, {"entities": [(start, end, label)]}) pairs into a DocBin of
+    annotated reference Docs. Tokenization and character-to-token alignment happen
+    here once, instead of on every training iteration.
+    Returns (doc_bin, skipped) where skipped counts entities that don't line up
+    with token boundaries.
+    """
+    doc_bin = DocBin()
+    skipped = 0
+    for text, annotations in training_data:
+        doc, doc_skipped = make_reference_doc(nlp, text, annotations)
+        skipped += doc_skipped
+        doc_bin.add(doc)
+    return doc_bin, skipped
+
+def save_training_corpus(nlp, training_data, path):
+    """Convert training data and write it to a .spacy file"""
+    doc_bin, skipped = training_data_to_docbin(nlp, training_data)
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    doc_bin.to_disk(path)
+    return len(doc_bin), skipped
+
+def load_training_json(path):
+    """
+    Read training examples from JSON in the training_data_template.json format
+    (a "your_custom_entities" list, or just a list, of {"text", "entities": [...]})
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    records = data.get("your_custom_entities", []) if isinstance(data, dict) else data
+
+    training_data = []
+    for record in records:
+        entities = [(ent["start"], ent["end"], ent["label"]) for ent in record.get("entities", [])]
+        training_data.append((record["text"], {"entities": entities}))
+    return training_data
+
+def examples_from_docbin(nlp, doc_bin):
+    """
+    Build Examples from reference Docs in a DocBin (or a .spacy path)
+    The Examples can be reused across every training iteration.
+    """
+    if not isinstance(doc_bin, DocBin):
+        doc_bin = DocBin().from_disk(doc_bin)
+    return [Example(nlp.make_doc(reference.text), reference)
+            for reference in doc_bin.get_docs(nlp.vocab)]
+
+def load_examples(nlp, source):
+    """
+    Turn any supported training source into a list of Examples:
+    a .spacy corpus, a .json file, a list of (text, annotations) pairs,
+    or a list that already holds Examples
+    """
+    if isinstance(source, (str, Path)):
+        if Path(source).suffix == ".json":
+            source = load_training_json(source)
+        else:
+            return examples_from_docbin(nlp, source)
+
+    source = list(source)
+    if source and isinstance(source[0], Example):
+        return source
+    doc_bin, _ = training_data_to_docbin(nlp, source)
+    return examples_from_docbin(nlp, doc_bin)
+
+def iter_reference_docs(nlp, source):
+    """
+    Stream the gold reference Docs of anything load_examples accepts, one at a time
+    A .spacy corpus stays in its compact serialized form until each Doc is needed.
+    """
+    if isinstance(source, (str, Path)):
+        if Path(source).suffix != ".json":
+            yield from DocBin().from_disk(source).get_docs(nlp.vocab)
+            return
+        source = load_training_json(source)
+
+    for item in source:
+        if isinstance(item, Example):
+            yield item.reference
+        else:
+            yield make_reference_doc(nlp, *item)[0]
+
+def example_labels(examples):
+    """All entity labels used in the reference annotations"""
+    return {ent.label_ for example in examples for ent in example.reference.ents}